@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from thor_magni_tools.preprocessing import TrajectoriesReprocessor
+from thor_magni_tools.preprocessing.frame_grid import get_frame_stride
+
+FAULTY_COLUMNS = ["x", "y"]
+
+
+def get_agent_df(frame_rate: int, n_frames: int = 300) -> pd.DataFrame:
+    """single agent recorded at `frame_rate` Hz with a gap of untracked frames"""
+    rng = np.random.default_rng(0)
+    frames = np.arange(n_frames)
+    agent_df = pd.DataFrame(
+        dict(
+            frame_id=frames.astype(np.int32),
+            x=np.cumsum(rng.normal(size=n_frames)).astype(np.float32),
+            y=np.cumsum(rng.normal(size=n_frames)).astype(np.float32),
+        ),
+        index=pd.Index(frames / frame_rate, name="Time"),
+    )
+    agent_df.iloc[40:55, 1:] = np.NaN
+    return agent_df
+
+
+@pytest.mark.parametrize(
+    "resampling_rule, average_window",
+    [("400ms", None), (None, "800ms"), ("400ms", "800ms")],
+)
+def test_frame_grid_matches_time_based_at_100hz(resampling_rule, average_window):
+    agent_df = get_agent_df(frame_rate=100)
+    grid_df = TrajectoriesReprocessor.resample_and_smooth(
+        agent_df, FAULTY_COLUMNS, resampling_rule, average_window, frame_rate=100
+    )
+    time_df = TrajectoriesReprocessor.resample_and_smooth_time(
+        agent_df, FAULTY_COLUMNS, resampling_rule, average_window
+    )
+    pd.testing.assert_frame_equal(
+        grid_df, time_df, check_dtype=False, check_index_type=False
+    )
+
+
+@pytest.mark.parametrize(
+    "frame_rate, resampling_rule, average_window",
+    [(30, "250ms", "450ms"), (30, None, "450ms"), (None, "400ms", "800ms")],
+)
+def test_periods_off_the_frame_grid_are_time_based(
+    frame_rate, resampling_rule, average_window
+):
+    """e.g. SDD (30 fps): 250ms is not a whole number of frames"""
+    agent_df = get_agent_df(frame_rate=30)
+    reprocessed_df = TrajectoriesReprocessor.resample_and_smooth(
+        agent_df, FAULTY_COLUMNS, resampling_rule, average_window, frame_rate
+    )
+    time_df = TrajectoriesReprocessor.resample_and_smooth_time(
+        agent_df, FAULTY_COLUMNS, resampling_rule, average_window
+    )
+    pd.testing.assert_frame_equal(reprocessed_df, time_df)
+
+
+def test_frame_grid_at_30hz():
+    agent_df = get_agent_df(frame_rate=30)
+    grid_df = TrajectoriesReprocessor.resample_and_smooth(
+        agent_df, FAULTY_COLUMNS, "1s", "2s", frame_rate=30
+    )
+    time_df = TrajectoriesReprocessor.resample_and_smooth_time(
+        agent_df, FAULTY_COLUMNS, "1s", "2s"
+    )
+    np.testing.assert_allclose(grid_df.index, time_df.index)
+    np.testing.assert_allclose(
+        grid_df[FAULTY_COLUMNS], time_df[FAULTY_COLUMNS], rtol=1e-6
+    )
+
+
+def test_frame_stride():
+    assert get_frame_stride("400ms", frame_rate=100) == 40
+    assert get_frame_stride("1s", frame_rate=30) == 30
+    with pytest.raises(ValueError):
+        get_frame_stride("250ms", frame_rate=30)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from thor_magni_tools.analysis.global_analysis.dataset_analyzer import (
+    TRACKLET_LEN,
+    AgentsMetricsStream,
+    DatasetAnalyzer,
+)
+
+N_AGENTS = 3
+
+
+def get_agents_df(n_frames: int = 400) -> pd.DataFrame:
+    """time-ordered rows of agents tracked during the whole recording, with gaps
+    of untracked frames and an agent that leaves and comes back"""
+    rng = np.random.default_rng(0)
+    agents_dfs = []
+    for ag_id in range(N_AGENTS):
+        agent_df = pd.DataFrame(
+            dict(
+                x=np.cumsum(rng.normal(size=n_frames)),
+                y=np.cumsum(rng.normal(size=n_frames)),
+                ag_id=ag_id,
+            ),
+            index=pd.Index(np.arange(n_frames) / 10, name="Time"),
+        )
+        gap_start = rng.integers(n_frames - 100)
+        agent_df.iloc[gap_start : gap_start + 37, :2] = np.NaN
+        if ag_id == 0:
+            agent_df = agent_df.drop(agent_df.index[150:220])
+        agents_dfs.append(agent_df)
+    return pd.concat(agents_dfs).sort_index(kind="stable")
+
+
+@pytest.mark.parametrize("chunksize", [1, 16, 250])
+def test_stream_matches_whole_file_with_bounded_rows(chunksize):
+    agents_df = get_agents_df()
+    agents_stream = AgentsMetricsStream(
+        tracking_duration=True, benchmark_metrics=True
+    )
+    for start in range(0, len(agents_df), chunksize):
+        agents_stream.update(agents_df.iloc[start : start + chunksize])
+    agents_metrics = agents_stream.flush()
+
+    streamed_metrics = {}
+    for agent_metrics in agents_metrics.values():
+        for metric_name, metric_values in agent_metrics.items():
+            streamed_metrics.setdefault(metric_name, []).extend(metric_values)
+    whole_metrics = DatasetAnalyzer.get_benchmark_metrics(
+        agents_df, AgentsMetricsStream.METRICS_NAMES
+    )
+    whole_metrics.update(
+        tracking_duration=DatasetAnalyzer.get_dataset_tracking_durations(agents_df)
+    )
+    assert streamed_metrics.keys() == whole_metrics.keys()
+    for metric_name, metric_values in whole_metrics.items():
+        np.testing.assert_allclose(
+            np.sort(streamed_metrics[metric_name]), np.sort(metric_values)
+        )
+    # only the rows that do not fill a tracklet yet are held between chunks
+    assert agents_stream.max_carried_rows <= N_AGENTS * (TRACKLET_LEN - 1)
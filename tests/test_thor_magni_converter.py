@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from thor_magni_tools.analysis.dataset_converters.thor_magni import (
+    ThorMagniConverter,
+)
+from thor_magni_tools.io import (
+    TRAJECTORIES_FORMATS,
+    dump_trajectories_file,
+    is_trajectories_file,
+)
+
+
+def get_preprocessed_df(n_frames: int = 50) -> pd.DataFrame:
+    """filtered trajectories, as written by run_preprocessing (millimeters)"""
+    rng = np.random.default_rng(0)
+    agents_dfs = []
+    for ag_id, agent_type in [("Helmet_1", "Visitors"), ("DARKO_Robot", "Robot")]:
+        agents_dfs.append(
+            pd.DataFrame(
+                dict(
+                    frame_id=np.arange(n_frames),
+                    x=rng.normal(size=n_frames) * 1000,
+                    y=rng.normal(size=n_frames) * 1000,
+                    z=rng.normal(size=n_frames) * 1000,
+                    ag_id=ag_id,
+                    agent_type=agent_type,
+                ),
+                index=pd.Index(np.arange(n_frames) / 100, name="Time"),
+            )
+        )
+    return pd.concat(agents_dfs)
+
+
+@pytest.mark.parametrize("out_format", TRAJECTORIES_FORMATS)
+def test_preprocessed_outputs_are_not_filtered_again(tmp_path, out_format):
+    scenario_dir = tmp_path / "Scenario_2"
+    scenario_dir.mkdir()
+    data_path = str(scenario_dir / f"THOR-Magni_120522_SC2_R1.{out_format}")
+    preprocessed_df = get_preprocessed_df()
+    dump_trajectories_file(preprocessed_df, data_path, out_format)
+
+    assert is_trajectories_file(data_path)
+    converted_df = ThorMagniConverter.convert(data_path, "3D-best_marker")
+    expected_df = preprocessed_df[preprocessed_df.ag_id == "Helmet_1"].copy()
+    expected_df[["x", "y", "z"]] /= 1000
+    pd.testing.assert_frame_equal(
+        converted_df.reset_index().astype({"ag_id": str, "agent_type": str}),
+        expected_df.reset_index(),
+        check_dtype=False,
+        rtol=1e-6,
+    )
+
+
+def test_raw_recordings_are_not_trajectories_files(tmp_path):
+    raw_path = tmp_path / "THOR-Magni_120522_SC2_R1.csv"
+    raw_path.write_text("FILE_ID,THOR-Magni_120522_SC2_R1\nN_FRAMES,1000\n")
+    assert not is_trajectories_file(str(raw_path))
@@ -1 +1,6 @@
-from .convert import convert_dataset  # noqa F401
+from .convert import (  # noqa F401
+    convert_dataset,
+    stream_dataset,
+    STREAMING_DATASETS,
+    FRAME_RATES,
+)
@@ -1,20 +1,56 @@
+from typing import Iterator
+import numpy as np
 import pandas as pd
 
+ATC_cols = [
+    "Time",
+    "ag_id",
+    "x",
+    "y",
+    "z",
+    "velocity",
+    "angle of motion",
+    "facing angle",
+]
+ATC_dtypes = {
+    "ag_id": np.int64,
+    "x": np.float32,
+    "y": np.float32,
+    "z": np.float32,
+    "velocity": np.float32,
+    "angle of motion": np.float32,
+    "facing angle": np.float32,
+}
+
 
 class ATCConverter:
     @staticmethod
     def convert(data_path: str):
         return pd.read_csv(
             data_path,
-            names=[
-                "Time",
-                "ag_id",
-                "x",
-                "y",
-                "z",
-                "velocity",
-                "angle of motion",
-                "facing angle",
-            ],
+            names=ATC_cols,
             index_col=0,
         )
+
+    @staticmethod
+    def stream(data_path: str, chunksize: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """Yield time-ordered chunks of the converted file with narrowed dtypes.
+        ATC files are written in time order, so rows sharing the last timestamp of
+        a chunk are carried over to the next one, i.e. chunks never split a frame.
+        """
+        carry_df = None
+        for chunk in pd.read_csv(
+            data_path,
+            names=ATC_cols,
+            index_col=0,
+            dtype=ATC_dtypes,
+            chunksize=chunksize,
+        ):
+            if carry_df is not None:
+                chunk = pd.concat([carry_df, chunk])
+            last_time_mask = chunk.index == chunk.index[-1]
+            carry_df = chunk[last_time_mask]
+            if not last_time_mask.all():
+                yield chunk[~last_time_mask]
+        if carry_df is not None:
+            yield carry_df
@@ -1,15 +1,25 @@
+from typing import Iterator
+import pandas as pd
+
 from .thor_magni import ThorMagniConverter
 from .thor import ThorConverter
 from .eth_ucy import ETHUCYConverter
 from .sdd import SDDConverter
 from .atc import ATCConverter
+from ...preprocessing.frame_grid import FRAME_RATE_HZ
+from ...utils.schema import apply_trajectories_schema
 
 ROLES_PATH = "/home/tmr/Documents/PhD/My_PhD/code/datasets/thor/roles.json"
+STREAMING_DATASETS = ("sdd", "atc")
+# datasets recorded at a fixed frame rate (Hz), reprocessed on the frame grid
+FRAME_RATES = {"thor_magni": FRAME_RATE_HZ}
 
 
 def convert_dataset(dataset_name: str, data_path: str, **kwargs):
     if dataset_name == "thor_magni":
-        dynamic_agents = ThorMagniConverter.convert(data_path, kwargs["filtering_markers"])
+        dynamic_agents = ThorMagniConverter.convert(
+            data_path, kwargs["filtering_markers"], kwargs.get("cache")
+        )
     elif dataset_name == "thor":
         dynamic_agents = ThorConverter.convert(data_path, ROLES_PATH, kwargs["filtering_markers"])
     elif dataset_name == "eth_ucy":
@@ -18,4 +28,17 @@ def convert_dataset(dataset_name: str, data_path: str, **kwargs):
         dynamic_agents = SDDConverter.convert(data_path)
     elif dataset_name == "atc":
         dynamic_agents = ATCConverter.convert(data_path)
-    return dynamic_agents
+    return apply_trajectories_schema(dynamic_agents)
+
+
+def stream_dataset(
+    dataset_name: str, data_path: str, chunksize: int
+) -> Iterator[pd.DataFrame]:
+    """time-ordered chunks of the converted dataset, chunks never split a frame"""
+    if dataset_name == "sdd":
+        return SDDConverter.stream(data_path, chunksize)
+    elif dataset_name == "atc":
+        return ATCConverter.stream(data_path, chunksize)
+    raise ValueError(
+        f"Streaming not supported for {dataset_name}. Options: {STREAMING_DATASETS}"
+    )
@@ -1,3 +1,7 @@
+import os
+import tempfile
+from typing import Iterator
+import numpy as np
 import pandas as pd
 
 SDD_cols = [
@@ -12,19 +16,30 @@ SDD_cols = [
     "generated",
     "agent_type",
 ]
+SDD_agent_types = pd.CategoricalDtype(
+    ["Biker", "Pedestrian", "Skater", "Cart", "Car", "Bus"]
+)
+SDD_dtypes = {
+    "ag_id": np.int32,
+    "xmin": np.float32,
+    "ymin": np.float32,
+    "xmax": np.float32,
+    "ymax": np.float32,
+    "frame_id": np.int32,
+    "lost": np.int8,
+    "occluded": np.int8,
+    "generated": np.int8,
+    "agent_type": SDD_agent_types,
+}
 STEP = 1
+FRAMES_PER_BUCKET = 3000
 
 
 class SDDConverter:
     @staticmethod
-    def convert(data_path: str):
-        raw_df = pd.read_csv(
-            data_path,
-            header=0,
-            delimiter=" ",
-            names=SDD_cols,
-        )
-        raw_df = raw_df[raw_df["lost"] == 0]
+    def filter_lost_and_center(raw_df: pd.DataFrame) -> pd.DataFrame:
+        """keep tracked boxes and use their center as the agent location"""
+        raw_df = raw_df[raw_df["lost"] == 0].copy()
         raw_df["x"] = (raw_df["xmax"] + raw_df["xmin"]) / 2
         raw_df["y"] = (raw_df["ymax"] + raw_df["ymin"]) / 2
         converted_df = raw_df.drop(
@@ -40,3 +55,46 @@ class SDDConverter:
         )
         converted_df.index = converted_df.index * STEP / 30
         return converted_df
+
+    @staticmethod
+    def convert(data_path: str):
+        raw_df = pd.read_csv(
+            data_path,
+            header=0,
+            delimiter=" ",
+            names=SDD_cols,
+        )
+        return SDDConverter.filter_lost_and_center(raw_df)
+
+    @staticmethod
+    def stream(data_path: str, chunksize: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """Yield time-ordered chunks of the converted file with narrowed dtypes.
+        SDD annotations are sorted by agent, so the filtered chunks are first
+        spilled to disk in buckets of `FRAMES_PER_BUCKET` frames and then each
+        bucket is sorted by frame and yielded.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            buckets = {}
+            for i, chunk in enumerate(
+                pd.read_csv(
+                    data_path,
+                    header=0,
+                    delimiter=" ",
+                    names=SDD_cols,
+                    dtype=SDD_dtypes,
+                    chunksize=chunksize,
+                )
+            ):
+                converted_chunk = SDDConverter.filter_lost_and_center(chunk)
+                bucket_ids = converted_chunk["frame_id"].values // FRAMES_PER_BUCKET
+                for bucket_id, bucket_df in converted_chunk.groupby(bucket_ids):
+                    bucket_path = os.path.join(tmp_dir, f"{bucket_id}_{i}.pkl")
+                    bucket_df.to_pickle(bucket_path)
+                    buckets.setdefault(bucket_id, []).append(bucket_path)
+            for bucket_id in sorted(buckets):
+                bucket_df = pd.concat(
+                    [pd.read_pickle(bucket_path) for bucket_path in buckets[bucket_id]]
+                )
+                for bucket_path in buckets[bucket_id]:
+                    os.remove(bucket_path)
+                yield bucket_df.sort_values("frame_id", kind="stable")
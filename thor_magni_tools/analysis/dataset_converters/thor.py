@@ -6,6 +6,7 @@ import numpy as np
 
 from thor_magni_tools.preprocessing.filtering import Filterer3DOF
 from thor_magni_tools.utils.load import load_json_file
+from thor_magni_tools.utils.columns import get_columns_layout
 
 
 class ThorConverter:
@@ -42,20 +43,12 @@ class ThorConverter:
 
     @staticmethod
     def get_markers_col_names(input_df: pd.DataFrame) -> List[list]:
-        pattern = re.compile(r"((.*?) - (\d+)) (X|Y|Z)$")
-        column_groups = {}
-
-        for col in input_df.columns:
-            match = pattern.match(col)
-            if match:
-                prefix = match.group(1)
-                suffix = match.group(4)
-
-                if prefix not in column_groups:
-                    column_groups[prefix] = []
-                column_groups[prefix].append(f"{prefix} {suffix}")
-
-        return list(column_groups.values())
+        columns_layout = get_columns_layout(input_df.columns)
+        return [
+            columns_layout.get_marker_columns(body, marker_id)
+            for body, markers in columns_layout.markers.items()
+            for marker_id in markers
+        ]
 
     @staticmethod
     def replace_zeros_by_nans(input_df: pd.DataFrame) -> pd.DataFrame:
@@ -1,4 +1,8 @@
+from typing import Optional
+
 from thor_magni_tools.preprocessing.filtering import Filterer3DOF
+from thor_magni_tools.io import is_trajectories_file, load_trajectories_file
+from thor_magni_tools.utils.cache import RawRecordingsCache
 from thor_magni_tools.utils.load import (
     load_csv_metadata_magni,
     preprocessing_header_magni,
@@ -15,17 +19,25 @@ class ThorMagniConverter:
         return ("Helmet",)  # "DARKO_Robot")
 
     @staticmethod
-    def convert(data_path: str, filtering_markers: str):
+    def convert(
+        data_path: str,
+        filtering_markers: str,
+        cache: Optional[RawRecordingsCache] = None,
+    ):
         scenario_id = data_path.split("/")[-2]
-        raw_df, header_dict = load_csv_metadata_magni(data_path)
-        new_header_dict = preprocessing_header_magni(header_dict)
-        traj_metadata = new_header_dict["SENSOR_DATA"]["TRAJECTORIES"]["METADATA"]
-        roles = {k: metadata["ROLE"] for k, metadata in traj_metadata.items()}
+        if is_trajectories_file(data_path):
+            # outputs of run_preprocessing are already filtered
+            filtered_markers_traj = load_trajectories_file(data_path)
+        else:
+            raw_df, header_dict = load_csv_metadata_magni(data_path, cache=cache)
+            new_header_dict = preprocessing_header_magni(header_dict)
+            traj_metadata = new_header_dict["SENSOR_DATA"]["TRAJECTORIES"]["METADATA"]
+            roles = {k: metadata["ROLE"] for k, metadata in traj_metadata.items()}
 
-        if filtering_markers == "3D-best_marker":
-            filtered_markers_traj = Filterer3DOF.filter_best_markers(raw_df, roles)
-        elif filtering_markers == "3D-restoration":
-            filtered_markers_traj = Filterer3DOF.restore_markers(raw_df, roles)
+            if filtering_markers == "3D-best_marker":
+                filtered_markers_traj = Filterer3DOF.filter_best_markers(raw_df, roles)
+            elif filtering_markers == "3D-restoration":
+                filtered_markers_traj = Filterer3DOF.restore_markers(raw_df, roles)
         dynamic_agents_name = ThorMagniConverter.get_dynamic_agents_prefix(
             scenario_id=scenario_id
         )
@@ -1,2 +1,7 @@
 from .spatio_temporal_features import SpatioTemporalFeatures  # noqa F402
-from .spatial_features import pairwise_distances  # noqa F402
\ No newline at end of file
+from .spatial_features import (  # noqa F402
+    pairwise_distances,
+    min_pairwise_distances,
+    close_pairs,
+)
+from .close_encounters import CloseEncountersExtractor  # noqa F402
\ No newline at end of file
@@ -0,0 +1,144 @@
+from typing import Dict, Hashable, List, Tuple
+import numpy as np
+import pandas as pd
+
+from .spatial_features import close_pairs
+
+
+class CloseEncountersExtractor:
+    """Intervals during which pairs of agents are closer than a threshold.
+
+    Time-ordered chunks of the long format data (|Time|frame_id|ag_id|x|y|, frames
+    given by `frame_id` or by the timestamps) are swept once: the pairs close in
+    last `max_gap_frames` + 1 frames seen are kept active and the other intervals
+    are returned as soon as they end. An interval spans frames of the data with at
+    most `max_gap_frames` frames without closeness in between, and its start and
+    end are the timestamps of its first and last close frames.
+    """
+
+    COLUMNS = ["ag_id1", "ag_id2", "start", "end", "min_distance", "duration"]
+
+    def __init__(self, threshold: float, max_gap_frames: int = 0) -> None:
+        self.threshold = threshold
+        self.max_gap_frames = max_gap_frames
+        self.n_frames = 0
+        # {(ag_id1, ag_id2): [ag_id1, ag_id2, start, end, min_distance, last_rank]}
+        self.active: Dict[Tuple[Hashable, Hashable], list] = {}
+
+    @staticmethod
+    def to_dataframe(intervals: List[list]) -> pd.DataFrame:
+        intervals_df = pd.DataFrame(
+            [interval[:5] for interval in intervals],
+            columns=CloseEncountersExtractor.COLUMNS[:-1],
+        )
+        intervals_df["duration"] = intervals_df["end"] - intervals_df["start"]
+        return intervals_df
+
+    def get_chunk_pairsruns(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """close pairs of the chunk grouped in runs of frames (up to `max_gap_frames`
+        frames apart)
+
+        Returns
+        -------
+            DataFrame |ag_id1|ag_id2|start|end|min_distance|first_rank|last_rank
+        """
+        frames = (
+            chunk["frame_id"].to_numpy()
+            if "frame_id" in chunk.columns
+            else chunk.index.to_numpy()
+        )
+        points = chunk[["x", "y"]].to_numpy()
+        _, frames_ranks = np.unique(frames, return_inverse=True)
+        frames_ranks = frames_ranks + self.n_frames
+        self.n_frames = frames_ranks.max(initial=self.n_frames - 1) + 1
+
+        valid = ~np.isnan(points).any(axis=1)
+        frames_ranks = frames_ranks[valid]
+        first, second, distances = close_pairs(
+            frames_ranks, points[valid], self.threshold
+        )
+        agents = chunk["ag_id"].to_numpy()[valid]
+        times = chunk.index.to_numpy()[valid]
+        agents1, agents2 = agents[first], agents[second]
+        swap = agents1 > agents2
+        pairs_df = pd.DataFrame(
+            dict(
+                ag_id1=np.where(swap, agents2, agents1),
+                ag_id2=np.where(swap, agents1, agents2),
+                rank=frames_ranks[first],
+                time=times[first],
+                distance=distances,
+            )
+        )
+        pairs_df = pairs_df[pairs_df["ag_id1"] != pairs_df["ag_id2"]]
+        pairs_df = pairs_df.sort_values(["ag_id1", "ag_id2", "rank"], kind="stable")
+        new_run = (
+            (pairs_df["ag_id1"] != pairs_df["ag_id1"].shift())
+            | (pairs_df["ag_id2"] != pairs_df["ag_id2"].shift())
+            | (pairs_df["rank"] > pairs_df["rank"].shift() + 1 + self.max_gap_frames)
+        )
+        return pairs_df.groupby(new_run.cumsum().to_numpy(), sort=False).agg(
+            ag_id1=("ag_id1", "first"),
+            ag_id2=("ag_id2", "first"),
+            start=("time", "first"),
+            end=("time", "last"),
+            min_distance=("distance", "min"),
+            first_rank=("rank", "first"),
+            last_rank=("rank", "last"),
+        )
+
+    def update(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Sweep the next chunk of frames, which must not split a frame
+
+        Returns
+        -------
+            intervals that ended before the last frame of the chunk
+        """
+        first_rank = self.n_frames
+        runs_df = self.get_chunk_pairsruns(chunk)
+        last_rank = self.n_frames - 1
+        if last_rank < first_rank:
+            return CloseEncountersExtractor.to_dataframe([])
+
+        max_rank_step = 1 + self.max_gap_frames
+        runs = list(runs_df.itertuples(index=False))
+        chunk_pairs = {(run.ag_id1, run.ag_id2) for run in runs}
+        # active intervals not extended by the chunk
+        closed = [
+            self.active.pop(pair)
+            for pair in list(self.active)
+            if pair not in chunk_pairs
+            and self.active[pair][5] + max_rank_step <= last_rank
+        ]
+        for run in runs:
+            pair = (run.ag_id1, run.ag_id2)
+            interval = [*pair, run.start, run.end, run.min_distance, run.last_rank]
+            if (
+                pair in self.active
+                and run.first_rank <= self.active[pair][5] + max_rank_step
+            ):
+                interval[2] = self.active[pair][2]
+                interval[4] = min(self.active.pop(pair)[4], run.min_distance)
+            elif pair in self.active:
+                closed.append(self.active.pop(pair))
+            if run.last_rank + max_rank_step > last_rank:
+                self.active[pair] = interval
+            else:
+                closed.append(interval)
+        return CloseEncountersExtractor.to_dataframe(closed)
+
+    def flush(self) -> pd.DataFrame:
+        """intervals still active at the end of the data"""
+        closed = list(self.active.values())
+        self.active = {}
+        return CloseEncountersExtractor.to_dataframe(closed)
+
+    @staticmethod
+    def extract(
+        dynamic_agents: pd.DataFrame, threshold: float, max_gap_frames: int = 0
+    ) -> pd.DataFrame:
+        """all the close encounters of a dataset loaded at once"""
+        extractor = CloseEncountersExtractor(threshold, max_gap_frames)
+        return pd.concat(
+            [extractor.update(dynamic_agents), extractor.flush()], ignore_index=True
+        )
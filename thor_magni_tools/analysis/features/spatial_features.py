@@ -1,6 +1,90 @@
+from typing import Optional, Tuple
 import numpy as np
+from scipy.spatial import cKDTree
 
 
 def pairwise_distances(points):
     x, y = points[:, 0], points[:, 1]
     return np.sqrt((x[:, None] - x) ** 2 + (y[:, None] - y) ** 2)
+
+
+def min_pairwise_distances(
+    frames: np.ndarray, points: np.ndarray, max_distance: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Min distance between the points of each frame, for all the frames at once.
+
+    The frames are stacked along a third axis spaced by more than the diagonal of
+    the scene, so the nearest neighbor of a point in a single KD-tree of all the
+    points is in its own frame, unless it is alone in it.
+
+    Parameters
+    ----------
+    frames
+        (N,) frame (or timestamp) of each point
+    points
+        (N, 2) x, y locations, points with NaNs are ignored
+    max_distance
+        optional cutoff radius, frames whose min distance is larger are left out
+
+    Returns
+    -------
+        sorted frames with at least two points and their min distance
+    """
+    valid = ~np.isnan(points).any(axis=1)
+    if frames.dtype.kind == "f":
+        valid &= ~np.isnan(frames)
+    frames_ids, frames_ranks = np.unique(frames[valid], return_inverse=True)
+    points = points[valid]
+    if len(points) < 2:
+        return frames_ids[:0], np.empty(0, dtype=points.dtype)
+    points_64 = points.astype(np.float64)
+    scene_diagonal = np.hypot(*np.ptp(points_64, axis=0))
+    frames_spacing = 2 * (scene_diagonal + (max_distance or 0.0)) + 1.0
+    tree = cKDTree(np.column_stack([points_64, frames_ranks * frames_spacing]))
+    _, neighbors = tree.query(
+        tree.data, k=2, distance_upper_bound=max_distance or np.inf
+    )
+    neighbors = neighbors[:, 1]
+    found = neighbors < len(points)
+    found[found] = frames_ranks[neighbors[found]] == frames_ranks[found]
+    # distances computed as in `pairwise_distances`, in the dtype of the points
+    first, second = points[found], points[neighbors[found]]
+    distances = np.sqrt(
+        (first[:, 0] - second[:, 0]) ** 2 + (first[:, 1] - second[:, 1]) ** 2
+    )
+    order = np.argsort(frames_ranks[found], kind="stable")
+    found_ranks = frames_ranks[found][order]
+    ranks, frames_starts = np.unique(found_ranks, return_index=True)
+    return frames_ids[ranks], np.minimum.reduceat(distances[order], frames_starts)
+
+
+def close_pairs(
+    frames_ranks: np.ndarray, points: np.ndarray, max_distance: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pairs of points of the same frame closer than `max_distance`, found with a
+    single KD-tree of all the points (frames stacked along a third axis)
+
+    Parameters
+    ----------
+    frames_ranks
+        (N,) integer rank of the frame of each point
+    points
+        (N, 2) x, y locations without NaNs
+
+    Returns
+    -------
+        (P,) first and second rows of each pair (first < second) and their
+        distance
+    """
+    tree = cKDTree(
+        np.column_stack(
+            [points.astype(np.float64), frames_ranks * (2 * max_distance + 1.0)]
+        )
+    )
+    pairs = tree.query_pairs(max_distance, output_type="ndarray")
+    first, second = points[pairs[:, 0]], points[pairs[:, 1]]
+    distances = np.sqrt(
+        (first[:, 0] - second[:, 0]) ** 2 + (first[:, 1] - second[:, 1]) ** 2
+    )
+    closer = distances < max_distance
+    return pairs[closer, 0], pairs[closer, 1], distances[closer]
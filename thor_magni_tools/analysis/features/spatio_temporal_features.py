@@ -1,11 +1,16 @@
 import logging
-from typing import List, Union
+from typing import Dict, List, Sequence, Union
 import pandas as pd
 import numpy as np
-from scipy.spatial.distance import euclidean
+
+from ...utils.partition import AgentsPartition
 
 LOGGER = logging.getLogger(__name__)
 
+# in the order they are chained, e.g. path efficiency and curvature use the deltas
+# computed with the speed
+FEATURES = ("speed", "acceleration", "path_efficiency", "curvature")
+
 
 class SpatioTemporalFeatures:
     @staticmethod
@@ -142,9 +147,9 @@ class SpatioTemporalFeatures:
                     np.square(trajectory[["x_delta", "y_delta"]]).sum(axis=1)
                 )
             trajectory["cumsum_delta"] = trajectory["n_deltas"].cumsum()
-            first_location = trajectory["x"].iloc[0], trajectory["y"].iloc[0]
-            trajectory["dist_origin_loc_i"] = trajectory.apply(
-                lambda row: euclidean(first_location, (row["x"], row["y"])), axis=1
+            trajectory["dist_origin_loc_i"] = np.hypot(
+                trajectory["x"] - trajectory["x"].iloc[0],
+                trajectory["y"] - trajectory["y"].iloc[0],
             )
             trajectory[out_col_name] = (
                 trajectory["dist_origin_loc_i"] / trajectory["cumsum_delta"]
@@ -195,3 +200,173 @@ class SpatioTemporalFeatures:
             curvature_dfs.append(trajectory)
         LOGGER.info("%s created", out_col_name)
         return curvature_dfs
+
+    @staticmethod
+    def get_norm(deltas: np.ndarray) -> np.ndarray:
+        """euclidean norm over the last axis ignoring NaNs, as
+        `np.sqrt(np.square(deltas_df).sum(axis=1))`"""
+        squares = np.square(deltas)
+        return np.sqrt(np.where(np.isnan(squares), 0.0, squares).sum(axis=-1))
+
+    @staticmethod
+    def get_grouped_delta(values: np.ndarray, is_start: np.ndarray) -> np.ndarray:
+        """`diff` within each trajectory, NaN at the first row of each one"""
+        values = np.asarray(values)
+        if values.dtype.kind != "f":
+            values = values.astype(np.float64)
+        delta = np.empty_like(values)
+        delta[1:] = values[1:] - values[:-1]
+        delta[is_start] = np.NaN
+        return delta
+
+    @staticmethod
+    def get_grouped_cumsum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """`cumsum` within each trajectory. Trajectories of the same length (e.g.
+        tracklets) are summed row by row, as per trajectory cumsums; otherwise the
+        running sum is offset by its value before each trajectory"""
+        lengths = np.diff(np.append(starts, len(values)))
+        if len(values) > 0 and np.all(lengths == lengths[0]):
+            return np.cumsum(values.reshape(len(starts), -1), axis=1).ravel()
+        cumsum = np.cumsum(values)
+        offsets = np.repeat(np.append(0, cumsum)[starts], lengths)
+        return cumsum - offsets
+
+    @staticmethod
+    def get_grouped_gradient(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """`np.gradient` within each trajectory (of at least 2 rows), i.e. central
+        differences and one-sided differences at the first and last rows"""
+        ends = np.append(starts[1:], len(values)) - 1
+        gradient = np.empty_like(values)
+        gradient[1:-1] = (values[2:] - values[:-2]) / 2.0
+        gradient[starts] = values[np.minimum(starts + 1, ends)] - values[starts]
+        gradient[ends] = values[ends] - values[np.maximum(ends - 1, starts)]
+        return gradient
+
+    @staticmethod
+    def get_features_arrays(
+        times: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        starts: np.ndarray,
+        features: Sequence[str] = FEATURES,
+    ) -> Dict[str, np.ndarray]:
+        """Features of several trajectories stored one after the other (long format)
+        computed with grouped differences over the whole arrays
+
+        Parameters
+        ----------
+        times
+            (N,) timestamps
+        x, y
+            (N,) locations
+        starts
+            (T,) sorted first row of each trajectory, starting at 0
+        features
+            subset of `FEATURES`, the speed is always computed
+
+        Returns
+        -------
+            dict s.t. {column name: (N,) array}, with the columns added by the
+            chained `get_speed`, `get_acceleration`, `get_path_efficiency_index` and
+            `get_curvature`
+        """
+        unknown_features = set(features) - set(FEATURES)
+        if unknown_features:
+            raise ValueError(
+                f"Features {unknown_features} not supported. Options: {FEATURES}"
+            )
+        starts = np.asarray(starts, dtype=np.int64)
+        is_start = np.zeros(len(times), dtype=bool)
+        is_start[starts] = True
+        time_delta = SpatioTemporalFeatures.get_grouped_delta(times, is_start)
+
+        def get_norm_and_rates(x_delta, y_delta):
+            norm = SpatioTemporalFeatures.get_norm(np.stack([x_delta, y_delta], -1))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rates = [v / time_delta for v in (norm, x_delta, y_delta)]
+            return norm, [np.where(np.isnan(rate), 0.0, rate) for rate in rates]
+
+        x_delta = SpatioTemporalFeatures.get_grouped_delta(x, is_start)
+        y_delta = SpatioTemporalFeatures.get_grouped_delta(y, is_start)
+        n_deltas, (speed, x_speed, y_speed) = get_norm_and_rates(x_delta, y_delta)
+        x_delta = np.where(np.isnan(x_delta), 0.0, x_delta)
+        y_delta = np.where(np.isnan(y_delta), 0.0, y_delta)
+        columns = dict(
+            n_deltas=n_deltas,
+            x_delta=x_delta,
+            y_delta=y_delta,
+            speed=speed,
+            x_speed=x_speed,
+            y_speed=y_speed,
+        )
+        if "acceleration" in features:
+            n_speed_deltas, (acceleration, x_acceleration, y_acceleration) = (
+                get_norm_and_rates(
+                    SpatioTemporalFeatures.get_grouped_delta(x_speed, is_start),
+                    SpatioTemporalFeatures.get_grouped_delta(y_speed, is_start),
+                )
+            )
+            columns.update(
+                n_speed_deltas=n_speed_deltas,
+                acceleration=acceleration,
+                x_acceleration=x_acceleration,
+                y_acceleration=y_acceleration,
+            )
+        if "path_efficiency" in features:
+            cumsum_delta = SpatioTemporalFeatures.get_grouped_cumsum(n_deltas, starts)
+            lengths = np.diff(np.append(starts, len(times)))
+            x_origin = np.repeat(np.asarray(x, dtype=np.float64)[starts], lengths)
+            y_origin = np.repeat(np.asarray(y, dtype=np.float64)[starts], lengths)
+            dist_origin_loc_i = np.hypot(x_origin - x, y_origin - y)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                path_efficiency = dist_origin_loc_i / cumsum_delta
+            columns.update(
+                cumsum_delta=cumsum_delta,
+                dist_origin_loc_i=dist_origin_loc_i,
+                path_efficiency=np.where(
+                    np.isnan(path_efficiency), 1.0, path_efficiency
+                ),
+            )
+        if "curvature" in features:
+            squared_norms = x_delta * x_delta + y_delta * y_delta
+            is_straight = np.add.reduceat(np.square(squared_norms), starts) < 1.0
+            d2x = SpatioTemporalFeatures.get_grouped_gradient(x_delta, starts)
+            d2y = SpatioTemporalFeatures.get_grouped_gradient(y_delta, starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                curvature = np.abs(d2x * y_delta - x_delta * d2y) / np.power(
+                    squared_norms, 1.5
+                )
+            curvature[np.repeat(is_straight, np.diff(np.append(starts, len(x))))] = 0
+            columns.update(curvature=np.where(np.isnan(curvature), 0.0, curvature))
+        return columns
+
+    @staticmethod
+    def get_features(
+        trajectories: pd.DataFrame,
+        features: Sequence[str] = FEATURES,
+        trajectory_col: str = "ag_id",
+    ) -> pd.DataFrame:
+        """it receives a single long format dataframe of trajectories, identified by
+        `trajectory_col` (e.g. agent or tracklet ids), and it computes the features
+        of all of them at once. time must be passed as the index of the dataframe
+
+        trajectories[index]:
+            | frame_id | ag_id | x | y | z |
+
+        Returns features[index]:
+            rows grouped by trajectory (in order of appearance) with the columns of
+            pd.concat(get_curvature(get_path_efficiency_index(get_acceleration(...))))
+            for the requested features
+        """
+        partition = AgentsPartition(trajectories, agent_col=trajectory_col)
+        out_df = partition.sorted_df.iloc[partition.offsets[0]:].copy()
+        columns = SpatioTemporalFeatures.get_features_arrays(
+            out_df.index.to_numpy(),
+            out_df["x"].to_numpy(),
+            out_df["y"].to_numpy(),
+            partition.starts - partition.offsets[0],
+            features,
+        )
+        for col_name, values in columns.items():
+            out_df[col_name] = values
+        return out_df
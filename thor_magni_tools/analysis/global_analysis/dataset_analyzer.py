@@ -1,15 +1,24 @@
+import os
 import logging
-from itertools import combinations
-from typing import List, Optional
+from typing import Dict, Hashable, List, Optional, Tuple
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 from thor_magni_tools.data_tests.logger import CustomFormatter
-from thor_magni_tools.analysis.dataset_converters import convert_dataset
+from thor_magni_tools.io import create_dir
+from thor_magni_tools.analysis.dataset_converters import (
+    convert_dataset,
+    stream_dataset,
+    FRAME_RATES,
+)
 from thor_magni_tools.preprocessing import TrajectoriesReprocessor
+from thor_magni_tools.utils.partition import AgentsPartition
+from thor_magni_tools.analysis.utils import to_partial_metrics
 from thor_magni_tools.analysis.features import (
     SpatioTemporalFeatures,
-    pairwise_distances,
+    CloseEncountersExtractor,
+    min_pairwise_distances,
 )
 
 
@@ -20,6 +29,8 @@ ch.setLevel(logging.DEBUG)
 ch.setFormatter(CustomFormatter())
 LOGGER.addHandler(ch)
 
+TRACKLET_LEN = 20
+
 
 class DatasetAnalyzer:
     def __init__(
@@ -30,6 +41,7 @@ class DatasetAnalyzer:
         tracking_duration: bool,
         min_social_distance: bool,
         benchmark_metrics: bool,
+        chunksize: Optional[int] = None,
     ) -> None:
         self.dataset_name = dataset_name
         self.interpolation = interpolation
@@ -37,6 +49,7 @@ class DatasetAnalyzer:
         self.tracking_duration = tracking_duration
         self.benchmark_metrics = benchmark_metrics
         self.min_social_distance = min_social_distance
+        self.chunksize = chunksize
 
     @staticmethod
     def get_tracking_columns(df):
@@ -44,44 +57,89 @@ class DatasetAnalyzer:
 
     @staticmethod
     def get_groups_continuous_tracking(dynamic_agent_data: pd.DataFrame):
-        mask = dynamic_agent_data[["x", "y", "z"]].isna().any(axis=1)
+        coords_cols = [col for col in ("x", "y", "z") if col in dynamic_agent_data]
+        mask = dynamic_agent_data[coords_cols].isna().any(axis=1)
         groups = (mask != mask.shift()).cumsum()
         groups_of_continuous_tracking = dynamic_agent_data.groupby(groups)
         return groups_of_continuous_tracking
 
+    @staticmethod
+    def get_tracklets(
+        dynamic_agents: pd.DataFrame, tracklet_len: int = TRACKLET_LEN
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Consecutive tracklets of `tracklet_len` rows of the continuous tracking
+        groups of all the agents, gathered from strided windows over the rows
+        grouped by agent (in order of appearance)
+
+        Returns
+        -------
+            (T, tracklet_len) timestamps and (T, tracklet_len, 2) x, y locations
+        """
+        partition = AgentsPartition(dynamic_agents)
+        agents_data = partition.sorted_df.iloc[partition.offsets[0]:]
+        n_rows = len(agents_data)
+        if n_rows < tracklet_len:
+            return np.empty((0, tracklet_len)), np.empty((0, tracklet_len, 2))
+        coords_cols = [col for col in ("x", "y", "z") if col in agents_data]
+        mask = agents_data[coords_cols].isna().to_numpy().any(axis=1)
+        # groups of continuous (un)tracking, that do not span several agents
+        groups_starts = np.union1d(
+            np.flatnonzero(mask[1:] != mask[:-1]) + 1,
+            partition.starts - partition.offsets[0],
+        )
+        groups_lengths = np.diff(np.append(groups_starts, n_rows))
+        tracking_cols = DatasetAnalyzer.get_tracking_columns(agents_data)
+        untracked = np.logical_or.reduceat(
+            agents_data[tracking_cols].isna().to_numpy(), groups_starts, axis=0
+        ).all(axis=1)
+        num_tracklets = np.where(untracked, 0, groups_lengths // tracklet_len)
+        tracklets_ranks = np.arange(num_tracklets.sum()) - np.repeat(
+            np.cumsum(num_tracklets) - num_tracklets, num_tracklets
+        )
+        tracklets_starts = (
+            np.repeat(groups_starts, num_tracklets) + tracklets_ranks * tracklet_len
+        )
+        times_windows = sliding_window_view(agents_data.index.to_numpy(), tracklet_len)
+        locations_windows = sliding_window_view(
+            agents_data[["x", "y"]].to_numpy(), tracklet_len, axis=0
+        )
+        return (
+            times_windows[tracklets_starts],
+            locations_windows[tracklets_starts].transpose(0, 2, 1),
+        )
+
     @staticmethod
     def get_continuous_bechmark_metrics(
-        dynamic_agent_data: pd.DataFrame,
+        dynamic_agents: pd.DataFrame,
         metrics_names: List[str] | str,
-        tracklet_len: int = 20,
+        tracklet_len: int = TRACKLET_LEN,
     ) -> dict:
-        groups_of_continuous_tracking = DatasetAnalyzer.get_groups_continuous_tracking(
-            dynamic_agent_data
+        """motion speed and path efficiency of the batch of tracklets of the
+        continuous tracking groups of the agents"""
+        times, locations = DatasetAnalyzer.get_tracklets(dynamic_agents, tracklet_len)
+        return DatasetAnalyzer.get_tracklets_metrics(times, locations, metrics_names)
+
+    @staticmethod
+    def get_tracklets_metrics(
+        times: np.ndarray, locations: np.ndarray, metrics_names: List[str]
+    ) -> dict:
+        """motion speed and path efficiency of (T, L) timestamps and (T, L, 2)
+        locations of T tracklets of L rows"""
+        tracklet_len = times.shape[1]
+        features = SpatioTemporalFeatures.get_features_arrays(
+            times.ravel(),
+            locations[..., 0].ravel(),
+            locations[..., 1].ravel(),
+            starts=np.arange(0, times.size, tracklet_len),
+            features=("speed", "path_efficiency"),
         )
-        tracking_cols = DatasetAnalyzer.get_tracking_columns(dynamic_agent_data)
-        agent_metrics = {metric_name: [] for metric_name in metrics_names}
-        for _, group in groups_of_continuous_tracking:
-            if group[tracking_cols].isna().any(axis=0).all():
-                continue
-            num_tracklets = len(group) // tracklet_len
-            if num_tracklets == 0:
-                continue
-            tracklets = [
-                group.iloc[i * tracklet_len: (i + 1) * tracklet_len]
-                for i in range(num_tracklets)
-            ]
-            speed_tracklets = SpatioTemporalFeatures.get_speed(tracklets)
-            path_eff_tracklets = SpatioTemporalFeatures.get_path_efficiency_index(
-                speed_tracklets
-            )
-            for speed_track, path_eff_track in zip(speed_tracklets, path_eff_tracklets):
-                agent_metrics["motion_speed"].extend(
-                    speed_track.iloc[1:]["speed"].values.tolist()
-                )
-                agent_metrics["path_efficiency"].append(
-                    path_eff_track.iloc[1:]["path_efficiency"].iloc[-1]
-                )
-        return agent_metrics
+        speed = features["speed"].reshape(times.shape)
+        path_efficiency = features["path_efficiency"].reshape(times.shape)
+        metrics = dict(
+            motion_speed=speed[:, 1:].ravel().tolist(),
+            path_efficiency=path_efficiency[:, -1].tolist(),
+        )
+        return {metric_name: metrics[metric_name] for metric_name in metrics_names}
 
     @staticmethod
     def get_continuous_tracking_metrics(
@@ -105,26 +163,14 @@ class DatasetAnalyzer:
         metrics_names = (
             [metrics_names] if isinstance(metrics_names, str) else metrics_names
         )
-        benchmark_metrics = {}
-        for ag_id in dynamic_agents.ag_id.unique():
-            dynamic_object_data = dynamic_agents[dynamic_agents["ag_id"] == ag_id]
-            agent_metrics = DatasetAnalyzer.get_continuous_bechmark_metrics(
-                dynamic_object_data, metrics_names
-            )
-            benchmark_metrics[ag_id] = agent_metrics
-        overall_benchmark_metrics = {metric_name: [] for metric_name in metrics_names}
-        for agent_metrics in benchmark_metrics.values():
-            for metric_name in metrics_names:
-                overall_benchmark_metrics[metric_name].extend(
-                    agent_metrics[metric_name]
-                )
-        return overall_benchmark_metrics
+        return DatasetAnalyzer.get_continuous_bechmark_metrics(
+            dynamic_agents, metrics_names
+        )
 
     @staticmethod
     def get_dataset_tracking_durations(dynamic_agents: pd.DataFrame):
         tracking_duration = {}
-        for ag_id in dynamic_agents.ag_id.unique():
-            dynamic_object_data = dynamic_agents[dynamic_agents["ag_id"] == ag_id]
+        for ag_id, dynamic_object_data in AgentsPartition(dynamic_agents):
             continuous_tracking_durations = (
                 DatasetAnalyzer.get_continuous_tracking_metrics(
                     dynamic_object_data, "tracking_duration"
@@ -136,42 +182,138 @@ class DatasetAnalyzer:
             overall_tracking_durations.extend(tracking_durations)
         return overall_tracking_durations
 
+    @staticmethod
+    def get_humans(dynamic_agents: pd.DataFrame) -> pd.DataFrame:
+        """rows of the agents that are not robots (ids starting with DARKO or LO),
+        whatever the dtype of `ag_id` (object, categorical or integer ids)"""
+        robots_ids = [
+            ag_id
+            for ag_id in dynamic_agents.ag_id.unique()
+            if str(ag_id).startswith(("DARKO", "LO"))
+        ]
+        if not robots_ids:
+            return dynamic_agents
+        return dynamic_agents[~dynamic_agents.ag_id.isin(robots_ids)]
+
     @staticmethod
     def get_dataset_min_social_distances(dynamic_agents: pd.DataFrame):
-        if dynamic_agents.ag_id.dtype == str:
-            humans = dynamic_agents[~dynamic_agents.ag_id.str.startswith(("DARKO", "LO"))]
+        humans = DatasetAnalyzer.get_humans(dynamic_agents)
+        # datasets without frame ids (ATC) are grouped by timestamp
+        frames = (
+            humans["frame_id"].to_numpy()
+            if "frame_id" in humans.columns
+            else humans.index.to_numpy()
+        )
+        _, min_distances = min_pairwise_distances(
+            frames, humans[["x", "y"]].to_numpy()
+        )
+        return min_distances.tolist()
+
+    @staticmethod
+    def get_untracked_mask(dynamic_agent_data: pd.DataFrame) -> np.ndarray:
+        coords_cols = [col for col in ("x", "y", "z") if col in dynamic_agent_data]
+        return dynamic_agent_data[coords_cols].isna().to_numpy().any(axis=1)
+
+    def run_stream(self, data_path: str) -> dict:
+        """Compute the metrics over time-ordered chunks of the dataset, without
+        loading the whole file. Per frame metrics are computed chunk by chunk and
+        the per agent metrics are updated incrementally (see `AgentsMetricsStream`),
+        i.e. the metrics match the ones of the whole file. Metrics are gathered by
+        order of appearance of the agents.
+        """
+        if self.interpolation or self.average_window:
+            raise ValueError("Reprocessing is not supported in streaming mode")
+        min_social_distances = []
+        self.agents_stream = AgentsMetricsStream(
+            self.tracking_duration, self.benchmark_metrics
+        )
+        for chunk in stream_dataset(self.dataset_name, data_path, self.chunksize):
+            if self.min_social_distance:
+                min_social_distances.extend(
+                    DatasetAnalyzer.get_dataset_min_social_distances(chunk)
+                )
+            if self.tracking_duration or self.benchmark_metrics:
+                self.agents_stream.update(chunk)
+        agents_metrics = self.agents_stream.flush()
+        LOGGER.debug(
+            "Dataset streamed, at most %d rows carried over between chunks",
+            self.agents_stream.max_carried_rows,
+        )
+
+        metrics = {}
+        if self.tracking_duration:
+            metrics.update(tracking_duration=[])
+        if self.min_social_distance:
+            metrics.update(min_social_distances=min_social_distances)
+        if self.benchmark_metrics:
+            metrics.update(motion_speed=[], path_efficiency=[])
+        for agent_metrics in agents_metrics.values():
+            for metric_name, metric_values in agent_metrics.items():
+                metrics[metric_name].extend(metric_values)
+        return metrics
+
+    def dump_close_encounters(
+        self,
+        data_path: str,
+        threshold: float,
+        out_path: str,
+        max_gap_frames: int = 0,
+        dynamic_agents: Optional[pd.DataFrame] = None,
+        **kwargs,
+    ) -> int:
+        """Intervals during which pairs of humans are closer than `threshold`
+        (|ag_id1|ag_id2|start|end|min_distance|duration|), appended to the `out_path`
+        csv file as they end. The dataset is swept chunk by chunk in streaming mode,
+        `dynamic_agents` is the already converted dataset otherwise (e.g. the one
+        given to `run`). See `CloseEncountersExtractor` for `max_gap_frames`.
+
+        Returns
+        -------
+            number of close encounters
+        """
+        if self.chunksize:
+            chunks = stream_dataset(self.dataset_name, data_path, self.chunksize)
+        elif dynamic_agents is not None:
+            chunks = [dynamic_agents]
         else:
-            humans = dynamic_agents
-        grouped_frames = humans.groupby("frame_id")
-        distances, min_distances = {}, []
-        for frame, group in grouped_frames:
-            distances[frame], distances_ts = [], []
-            points = group[["x", "y"]].values
-            agents_ids = group["ag_id"].values
-            pairwise_dist_matrix = pairwise_distances(points)
-            np.fill_diagonal(pairwise_dist_matrix, np.inf)
-            agents_combinations = list(combinations(range(len(agents_ids)), 2))
-            for i, j in agents_combinations:
-                if not np.isnan(pairwise_dist_matrix[i, j]):
-                    distances[frame].append(
-                        {
-                            "ag_id1": agents_ids[i],
-                            "ag_id2": agents_ids[j],
-                            "distance": pairwise_dist_matrix[i, j],
-                        }
-                    )
+            chunks = [convert_dataset(self.dataset_name, data_path, **kwargs)]
+        create_dir(os.path.dirname(out_path) or ".")
+        extractor = CloseEncountersExtractor(threshold, max_gap_frames)
+        pd.DataFrame(columns=CloseEncountersExtractor.COLUMNS).to_csv(
+            out_path, index=False
+        )
+        n_encounters = 0
+        for chunk in chunks:
+            encounters = extractor.update(DatasetAnalyzer.get_humans(chunk))
+            encounters.to_csv(out_path, mode="a", header=False, index=False)
+            n_encounters += len(encounters)
+        encounters = extractor.flush()
+        encounters.to_csv(out_path, mode="a", header=False, index=False)
+        n_encounters += len(encounters)
+        LOGGER.info("%d close encounters stored in %s", n_encounters, out_path)
+        return n_encounters
 
-                    distances_ts.append(pairwise_dist_matrix[i, j])
-            if len(distances_ts) > 0:
-                min_distances.append(min(distances_ts))
-        return min_distances
+    def run_partial(self, data_path: str, **kwargs) -> dict:
+        """`run` with the metrics as arrays (see `merge_partial_metrics`)"""
+        return to_partial_metrics(self.run(data_path, **kwargs))
 
-    def run(self, data_path: str, **kwargs):
-        dynamic_agents = convert_dataset(self.dataset_name, data_path, **kwargs)
+    def run(
+        self,
+        data_path: str,
+        dynamic_agents: Optional[pd.DataFrame] = None,
+        **kwargs,
+    ):
+        """metrics of the dataset, `dynamic_agents` is the already converted dataset
+        (the file is converted otherwise)"""
+        if self.chunksize:
+            return self.run_stream(data_path)
+        if dynamic_agents is None:
+            dynamic_agents = convert_dataset(self.dataset_name, data_path, **kwargs)
         if self.interpolation or self.average_window:
             dynamic_agents = TrajectoriesReprocessor.reprocessing(
                 dynamic_agents,
                 max_nans_interpolate=self.interpolation,
+                frame_rate=FRAME_RATES.get(self.dataset_name),
                 resampling_rule=None,
                 average_window=self.average_window,
             )
@@ -194,6 +336,7 @@ class DatasetAnalyzer:
                 dynamic_agents = TrajectoriesReprocessor.reprocessing(
                     dynamic_agents,
                     max_nans_interpolate=150,
+                    frame_rate=FRAME_RATES.get(self.dataset_name),
                     resampling_rule="400ms",
                     average_window="800ms",
                 )
@@ -204,3 +347,131 @@ class DatasetAnalyzer:
             metrics.update(benchmark_metrics)
             LOGGER.info("Benchmark metrics computed")
         return metrics
+
+
+class AgentsMetricsStream:
+    """Tracking durations and benchmark metrics of each agent, updated with
+    time-ordered chunks of the dataset.
+
+    Only the state of the last continuous (un)tracking group of each agent is
+    carried over to the next chunks (also while the agent is absent): its first
+    and last timestamps, the tracking columns with NaNs and the rows that do not
+    fill a tracklet yet (less than `tracklet_len`). The metrics of the tracklets of
+    untracked groups are kept until the group ends, as such groups are skipped if
+    all their tracking columns have NaNs.
+    """
+
+    METRICS_NAMES = ["motion_speed", "path_efficiency"]
+
+    def __init__(
+        self,
+        tracking_duration: bool,
+        benchmark_metrics: bool,
+        tracklet_len: int = TRACKLET_LEN,
+    ) -> None:
+        self.tracking_duration = tracking_duration
+        self.benchmark_metrics = benchmark_metrics
+        self.tracklet_len = tracklet_len
+        # {ag_id: state of the last continuous (un)tracking group}
+        self.open_groups: Dict[Hashable, dict] = {}
+        # {ag_id: {metric name: values}}
+        self.agents_metrics: Dict[Hashable, dict] = {}
+        self.max_carried_rows = 0
+
+    @property
+    def carried_rows(self) -> int:
+        """rows of the open groups held until the next chunks"""
+        return sum(len(group["times"]) for group in self.open_groups.values())
+
+    def add_metrics(self, ag_id: Hashable, metrics: dict) -> None:
+        for metric_name, metric_values in metrics.items():
+            self.agents_metrics[ag_id].setdefault(metric_name, []).extend(
+                metric_values
+            )
+
+    def close_group(self, ag_id: Hashable) -> None:
+        group = self.open_groups.pop(ag_id)
+        if group["nans"].all():
+            return
+        if self.tracking_duration:
+            self.add_metrics(
+                ag_id, dict(tracking_duration=[group["end"] - group["start"]])
+            )
+        self.add_metrics(ag_id, group["pending_metrics"])
+
+    def update_group(
+        self,
+        ag_id: Hashable,
+        untracked: bool,
+        times: np.ndarray,
+        locations: np.ndarray,
+        nans: np.ndarray,
+    ) -> None:
+        """extend the open group of the agent with consecutive rows of the same
+        tracking status (`untracked`), closing it first if the status changed"""
+        group = self.open_groups.get(ag_id)
+        if group is not None and group["untracked"] != untracked:
+            self.close_group(ag_id)
+            group = None
+        if group is None:
+            group = dict(
+                untracked=untracked,
+                start=times[0],
+                nans=nans,
+                times=times[:0],
+                locations=locations[:0],
+                pending_metrics={},
+            )
+            self.open_groups[ag_id] = group
+        group["end"] = times[-1]
+        group["nans"] = group["nans"] | nans
+        if not self.benchmark_metrics:
+            return
+        times = np.concatenate([group["times"], times])
+        locations = np.concatenate([group["locations"], locations])
+        n_rows = len(times) - len(times) % self.tracklet_len
+        if n_rows > 0:
+            metrics = DatasetAnalyzer.get_tracklets_metrics(
+                times[:n_rows].reshape(-1, self.tracklet_len),
+                locations[:n_rows].reshape(-1, self.tracklet_len, 2),
+                AgentsMetricsStream.METRICS_NAMES,
+            )
+            if untracked:
+                for metric_name, metric_values in metrics.items():
+                    group["pending_metrics"].setdefault(metric_name, []).extend(
+                        metric_values
+                    )
+            else:
+                self.add_metrics(ag_id, metrics)
+        # copies, so that the chunk arrays are not referenced any more
+        group["times"] = times[n_rows:].copy()
+        group["locations"] = locations[n_rows:].copy()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        tracking_cols = DatasetAnalyzer.get_tracking_columns(chunk)
+        for ag_id, agent_chunk in chunk.groupby("ag_id", sort=False, observed=True):
+            self.agents_metrics.setdefault(ag_id, {})
+            mask = DatasetAnalyzer.get_untracked_mask(agent_chunk)
+            starts = np.append(0, np.flatnonzero(mask[1:] != mask[:-1]) + 1)
+            ends = np.append(starts[1:], len(mask))
+            times = agent_chunk.index.to_numpy()
+            locations = agent_chunk[["x", "y"]].to_numpy()
+            nans = np.logical_or.reduceat(
+                agent_chunk[tracking_cols].isna().to_numpy(), starts, axis=0
+            )
+            for i, (start, end) in enumerate(zip(starts, ends)):
+                self.update_group(
+                    ag_id, mask[start], times[start:end], locations[start:end], nans[i]
+                )
+        self.max_carried_rows = max(self.max_carried_rows, self.carried_rows)
+
+    def flush(self) -> Dict[Hashable, dict]:
+        """close the open groups
+
+        Returns
+        -------
+            dict s.t. {ag_id: {metric name: values}}, in order of appearance
+        """
+        for ag_id in list(self.open_groups):
+            self.close_group(ag_id)
+        return self.agents_metrics
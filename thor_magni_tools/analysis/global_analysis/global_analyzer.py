@@ -1,10 +1,17 @@
 import os
 import logging
+from functools import partial
 from typing import Optional
 
 from ...data_tests.logger import CustomFormatter
+from ...utils.executor import Executor
 from .dataset_analyzer import DatasetAnalyzer
-from ..utils import log_metrics, ResultSaver, AVAILABLE_SCENARIOS
+from ..utils import (
+    log_metrics,
+    merge_partial_metrics,
+    ResultSaver,
+    AVAILABLE_SCENARIOS,
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -25,6 +32,8 @@ class GlobalAnalyzer:
         min_social_distance: bool,
         benchmark_metrics: bool,
         save_path: str,
+        chunksize: Optional[int] = None,
+        executor: Optional[Executor] = None,
     ) -> None:
         self.dataset_name = dataset_name
         self.interpolation = interpolation
@@ -32,22 +41,21 @@ class GlobalAnalyzer:
         self.tracking_duration = tracking_duration
         self.min_social_distance = min_social_distance
         self.benchmark_metrics = benchmark_metrics
+        self.chunksize = chunksize
+        self.executor = executor or Executor()
         self.result_saver = ResultSaver(os.path.join(save_path, dataset_name))
 
     def organize_metrics(self, metrics: dict) -> dict:
-        new_metrics = {
-            metric_name: [] for metric_name in metrics[list(metrics.keys())[0]]
-        }
-        for _, metrics_details in metrics.items():
-            for metric_name, metric_values in metrics_details.items():
-                new_metrics[metric_name].extend(metric_values)
-        return new_metrics
+        return merge_partial_metrics(metrics.values())
 
     def run(self, data_path: str, **kwargs):
-        metrics = {}
+        scenarios_files = []
         for root, _, files in os.walk(data_path, topdown=True):
             target_files = list(
-                filter(lambda x: x.endswith((".csv", ".txt", ".tsv")), files)
+                filter(
+                    lambda x: x.endswith((".csv", ".txt", ".tsv", ".parquet", ".npz")),
+                    files,
+                )
             )
             if len(target_files) > 0:
                 scenario_id = [
@@ -56,28 +64,38 @@ class GlobalAnalyzer:
                     for ds in AVAILABLE_SCENARIOS
                     if ds in split
                 ][0]
-                metrics[scenario_id] = {}
-                for i, file_id in enumerate(target_files):
-                    LOGGER.debug("Running metrics on %s", file_id)
-                    file_path = os.path.join(root, file_id)
-                    dataset_analyzer = DatasetAnalyzer(
-                        dataset_name=self.dataset_name,
-                        interpolation=self.interpolation,
-                        average_window=self.average_window,
-                        tracking_duration=self.tracking_duration,
-                        benchmark_metrics=self.benchmark_metrics,
-                        min_social_distance=self.min_social_distance,
-                    )
-                    metrics_dataset = dataset_analyzer.run(file_path, **kwargs)
-                    if i == 0:
-                        metrics[scenario_id] = {
-                            metric_name: [] for metric_name in metrics_dataset.keys()
-                        }
-                    for metric_name, metric_value in metrics_dataset.items():
-                        metrics[scenario_id][metric_name].extend(metric_value)
-                scenario_metrics = metrics[scenario_id]
-                log_metrics(LOGGER, scenario_metrics)
+                files_paths = [os.path.join(root, file_id) for file_id in target_files]
+                scenarios_files.append((scenario_id, files_paths))
+
+        dataset_analyzer = DatasetAnalyzer(
+            dataset_name=self.dataset_name,
+            interpolation=self.interpolation,
+            average_window=self.average_window,
+            tracking_duration=self.tracking_duration,
+            benchmark_metrics=self.benchmark_metrics,
+            min_social_distance=self.min_social_distance,
+            chunksize=self.chunksize,
+        )
+        files_paths = [path for _, paths in scenarios_files for path in paths]
+        LOGGER.debug("Running metrics on %d files", len(files_paths))
+        # each file returns its metrics as arrays, merged per scenario and then
+        # globally in the order of the walk, whatever the backend
+        files_metrics = iter(
+            self.executor.map(
+                partial(dataset_analyzer.run_partial, **kwargs), files_paths
+            )
+        )
+
+        metrics = {}
+        for scenario_id, paths in scenarios_files:
+            metrics[scenario_id] = merge_partial_metrics(
+                next(files_metrics) for _ in paths
+            )
+            log_metrics(LOGGER, metrics[scenario_id])
         global_metrics = self.organize_metrics(metrics)
         self.result_saver.save_scenarios_results(metrics)
         self.result_saver.save_global_results(global_metrics)
-        return global_metrics
+        return {
+            metric_name: metric_values.tolist()
+            for metric_name, metric_values in global_metrics.items()
+        }
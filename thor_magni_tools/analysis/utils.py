@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, Iterable, List
 import pandas as pd
 import numpy as np
 
@@ -25,6 +25,30 @@ AVAILABLE_SCENARIOS = [
 ]
 
 
+def to_partial_metrics(metrics: Dict[str, list]) -> Dict[str, np.ndarray]:
+    """metrics lists -> arrays, cheaper to send back from the workers"""
+    return {
+        metric_name: np.asarray(metric_values)
+        for metric_name, metric_values in metrics.items()
+    }
+
+
+def merge_partial_metrics(
+    partial_metrics: Iterable[Dict[str, np.ndarray]]
+) -> Dict[str, np.ndarray]:
+    """concatenation of the values of each metric, in the order of the partial
+    metrics (the metrics names of the first one are kept)"""
+    partial_metrics = list(partial_metrics)
+    if len(partial_metrics) == 0:
+        return {}
+    return {
+        metric_name: np.concatenate(
+            [np.asarray(partial[metric_name]) for partial in partial_metrics]
+        )
+        for metric_name in partial_metrics[0]
+    }
+
+
 def log_metrics(logger, metrics):
     for metric_name, metric_value in metrics.items():
         metric_value = np.array(metric_value)
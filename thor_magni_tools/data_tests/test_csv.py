@@ -1,7 +1,9 @@
 import logging
+from typing import List
 import pandas as pd
 
 from .logger import CustomFormatter
+from ..utils.columns import get_columns_layout
 
 
 LOGGER = logging.getLogger(__name__)
@@ -65,9 +67,17 @@ def validate_header(file_name: str, header_dict: dict) -> None:
 
 def validate_header_with_dataframe(header_dict: dict, raw_df: pd.DataFrame):
     """Validate header in the csv file by comparing with dataframe"""
+    validate_header_with_columns(header_dict, raw_df.columns, raw_df.Frame.iloc[-1])
+
+
+def validate_header_with_columns(
+    header_dict: dict, columns: List[str], last_frame: int
+):
+    """Validate header in the csv file by comparing with the column names and the
+    last frame of the file (Time, i.e. the index column, not included)"""
     validated = True
     header_nframes = header_dict["SENSOR_DATA"]["TRAJECTORIES"]["N_FRAMES"]
-    df_nframes = raw_df.Frame.iloc[-1]
+    df_nframes = last_frame
     if header_nframes != df_nframes:
         LOGGER.error(
             "[HEADER/DF MISMATCH] N_FRAMES from header=%d but got %d \
@@ -76,8 +86,9 @@ def validate_header_with_dataframe(header_dict: dict, raw_df: pd.DataFrame):
             df_nframes,
         )
 
+    columns_layout = get_columns_layout(columns)
     # Validate n_bodies
-    df_nbodies = set(col.split(" ")[0] for col in raw_df.columns if col != "Frame")
+    df_nbodies = set(columns_layout.bodies)
     header_nbodies = header_dict["SENSOR_DATA"]["TRAJECTORIES"]["N_BODIES"]
     if header_nbodies != len(df_nbodies):
         validated = False
@@ -90,27 +101,13 @@ def validate_header_with_dataframe(header_dict: dict, raw_df: pd.DataFrame):
         )
 
     # Validate n_markers
-    df_possible_bodies_names = set(
-        col.split(" ")[0] for col in raw_df.columns if col != "Frame"
-    )
-    filtered_columns = [
-        col
-        for col in raw_df.columns
-        if any(col.startswith(prefix) for prefix in df_possible_bodies_names)
-    ]
-    df_columns_markers = [
-        col[:-2]
-        for col in filtered_columns
-        if any(char.isdigit() for char in col) and " - " in col and col.endswith("X")
-    ]
     df_bodies_markers = {}
-    for item in df_columns_markers:
-        key, value = item.split(" - ")
-        key = key.strip()  # Remove extra spaces around the key
-        value = int(value)  # Convert the last digits to integers
-        if key not in df_bodies_markers.keys():
-            df_bodies_markers.setdefault(key, [])
-        df_bodies_markers[key].append(value)
+    for body_name, markers in columns_layout.markers.items():
+        markers_ids = [
+            int(marker_id) for marker_id, axes in markers.items() if "X" in axes
+        ]
+        if len(markers_ids) > 0:
+            df_bodies_markers[body_name.strip()] = markers_ids
 
     header_metadata = header_dict["SENSOR_DATA"]["TRAJECTORIES"]["METADATA"]
     for df_body_name, df_markers in df_bodies_markers.items():
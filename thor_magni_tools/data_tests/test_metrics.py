@@ -0,0 +1,69 @@
+import logging
+import numpy as np
+
+from .logger import CustomFormatter
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(CustomFormatter())
+LOGGER.addHandler(ch)
+
+
+def validate_stream_metrics(streamed_metrics: dict, loaded_metrics: dict) -> bool:
+    """Validate the metrics computed in streaming mode by comparing with the ones
+    computed on the whole file. Values are compared sorted, as agents may appear in
+    another order in the chunks than in the file (e.g. SDD files sorted by agent)"""
+    validated = True
+    if streamed_metrics.keys() != loaded_metrics.keys():
+        LOGGER.error(
+            "[STREAM/LOAD MISMATCH] metrics %s streamed but %s loaded",
+            list(streamed_metrics.keys()),
+            list(loaded_metrics.keys()),
+        )
+        return False
+    for metric_name, loaded_values in loaded_metrics.items():
+        streamed_values = np.sort(
+            np.asarray(streamed_metrics[metric_name], dtype=float)
+        )
+        loaded_values = np.sort(np.asarray(loaded_values, dtype=float))
+        if streamed_values.shape != loaded_values.shape:
+            validated = False
+            LOGGER.error(
+                "[STREAM/LOAD MISMATCH] %d %s values streamed but %d loaded",
+                len(streamed_values),
+                metric_name,
+                len(loaded_values),
+            )
+        elif not np.allclose(streamed_values, loaded_values, equal_nan=True):
+            validated = False
+            LOGGER.error("[STREAM/LOAD MISMATCH] %s values differ", metric_name)
+    if validated:
+        LOGGER.info("Streamed metrics validated with the whole file!")
+    return validated
+
+
+def validate_stream_carried_rows(
+    max_carried_rows: int, n_agents: int, tracklet_len: int
+) -> bool:
+    """Validate that the rows carried over between chunks in streaming mode stay
+    bounded: less than a tracklet per agent, whatever the number of chunks"""
+    max_rows = n_agents * (tracklet_len - 1)
+    if max_carried_rows > max_rows:
+        LOGGER.error(
+            "[STREAM MEMORY] %d rows carried over between chunks, more than %d "
+            "(%d agents x %d rows)",
+            max_carried_rows,
+            max_rows,
+            n_agents,
+            tracklet_len - 1,
+        )
+        return False
+    LOGGER.info(
+        "Streamed with at most %d rows carried over between chunks (bound: %d)",
+        max_carried_rows,
+        max_rows,
+    )
+    return True
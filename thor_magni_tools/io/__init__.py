@@ -1,2 +1,13 @@
 from .dir import create_dir  # Noqa F402
-from .files import dump_json_file, load_json_file, load_yaml_file  # Noqa F402
+from .files import (  # Noqa F402
+    TRAJECTORIES_FORMATS,
+    dump_json_file,
+    load_json_file,
+    load_yaml_file,
+    dump_npz_dataframe,
+    load_npz_dataframe,
+    get_trajectories_file_name,
+    dump_trajectories_file,
+    load_trajectories_file,
+    is_trajectories_file,
+)
@@ -1,11 +1,23 @@
+import os
 import json
 import yaml
+import numpy as np
+import pandas as pd
+
+from ..utils.schema import apply_trajectories_schema
+
+
+def to_json_serializable(value):
+    """numpy scalars (e.g. float32 metrics) and arrays -> python numbers and lists"""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
 def dump_json_file(data_to_save: dict, save_path: str):
     """save json file"""
-    file_o = open(save_path, "w")
-    json.dump(data_to_save, file_o)
+    with open(save_path, "w") as file_o:
+        json.dump(data_to_save, file_o, default=to_json_serializable)
 
 
 def load_json_file(load_path: str):
@@ -19,3 +31,103 @@ def load_yaml_file(load_path: str) -> dict:
     with open(load_path, "r") as f:
         yaml_dict = yaml.safe_load(f)
     return yaml_dict
+
+
+def dump_npz_dataframe(
+    input_df: pd.DataFrame, save_path: str, metadata: dict = None
+) -> None:
+    """save a DataFrame column by column in a npz file. Object and categorical
+    columns are stored as codes + categories. The file is written to a temporary
+    path first and then moved, so readers never see partial files"""
+    arrays = {
+        "__columns__": np.array([str(col) for col in input_df.columns]),
+        "__index__": input_df.index.values,
+        "__index_name__": np.array(input_df.index.name or ""),
+        "__metadata__": np.array(json.dumps(metadata or {})),
+    }
+    kinds = []
+    for i, col in enumerate(input_df.columns):
+        values = input_df[col]
+        if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+            kinds.append("category" if values.dtype != object else "object")
+            values = values.astype("category")
+            arrays[f"c{i}_codes"] = values.cat.codes.values
+            arrays[f"c{i}_categories"] = np.array(
+                [str(cat) for cat in values.cat.categories]
+            )
+        else:
+            kinds.append("values")
+            arrays[f"c{i}"] = values.values
+    arrays["__kinds__"] = np.array(kinds)
+    tmp_path = f"{save_path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, save_path)
+
+
+def load_npz_dataframe(load_path: str):
+    """load a DataFrame saved with `dump_npz_dataframe`
+
+    Returns
+    -------
+        pandas DataFrame and the metadata dictionary
+    """
+    with np.load(load_path, allow_pickle=False) as data:
+        columns = data["__columns__"].tolist()
+        kinds = data["__kinds__"].tolist()
+        out_dict = {}
+        for i, (col, kind) in enumerate(zip(columns, kinds)):
+            if kind == "values":
+                out_dict[col] = data[f"c{i}"]
+                continue
+            values = pd.Categorical.from_codes(
+                data[f"c{i}_codes"], categories=data[f"c{i}_categories"].tolist()
+            )
+            out_dict[col] = values if kind == "category" else values.astype(object)
+        index = pd.Index(data["__index__"], name=str(data["__index_name__"]) or None)
+        metadata = json.loads(str(data["__metadata__"]))
+    return pd.DataFrame(out_dict, index=index), metadata
+
+
+TRAJECTORIES_FORMATS = ("csv", "parquet", "npz")
+
+
+def get_trajectories_file_name(file_name: str, out_format: str) -> str:
+    """replace the extension of the file name by the output format one"""
+    return f"{os.path.splitext(file_name)[0]}.{out_format}"
+
+
+def dump_trajectories_file(
+    input_df: pd.DataFrame, save_path: str, out_format: str = "csv"
+) -> None:
+    """save trajectories as csv, parquet or npz. Binary formats use compact dtypes"""
+    if out_format == "csv":
+        input_df.to_csv(save_path)
+    elif out_format == "parquet":
+        apply_trajectories_schema(input_df).to_parquet(save_path)
+    elif out_format == "npz":
+        dump_npz_dataframe(apply_trajectories_schema(input_df), save_path)
+    else:
+        raise ValueError(
+            f"Output format {out_format} not supported. Options: {TRAJECTORIES_FORMATS}"
+        )
+
+
+def load_trajectories_file(load_path: str, index_col: str = "Time") -> pd.DataFrame:
+    """load trajectories saved with `dump_trajectories_file`, the format is given
+    by the file extension"""
+    if load_path.endswith(".parquet"):
+        return pd.read_parquet(load_path)
+    elif load_path.endswith(".npz"):
+        return load_npz_dataframe(load_path)[0]
+    return pd.read_csv(load_path, index_col=index_col)
+
+
+def is_trajectories_file(load_path: str, agent_col: str = "ag_id") -> bool:
+    """whether the file was saved with `dump_trajectories_file`. Binary formats are
+    only written by it, csv files are told apart from raw recordings by their header
+    """
+    if load_path.endswith((".parquet", ".npz")):
+        return True
+    with open(load_path, "r") as f:
+        header = f.readline().rstrip("\r\n").split(",")
+    return agent_col in header
@@ -1,2 +1,5 @@
 from .reprocess import TrajectoriesReprocessor  # Noqa F402
-from .actions_merging import ActionsMerger # Noqa F402
\ No newline at end of file
+from .actions_merging import ActionsMerger # Noqa F402
+from .manifest import PreprocessingManifest  # Noqa F402
+from .online import OnlineTrajectoriesReprocessor, replay_recording  # Noqa F402
+from .sweep import SweepReprocessor  # Noqa F402
@@ -3,7 +3,12 @@ import logging
 from typing import Dict
 import pandas as pd
 
-from thor_magni_tools.io import create_dir
+from thor_magni_tools.io import (
+    create_dir,
+    dump_trajectories_file,
+    get_trajectories_file_name,
+    load_trajectories_file,
+)
 from thor_magni_tools.data_tests.logger import CustomFormatter
 
 
@@ -16,10 +21,13 @@ LOGGER.addHandler(ch)
 
 
 class ActionsMerger:
-    def __init__(self, actions_path: str, csv_path: str, out_dir: str) -> None:
+    def __init__(
+        self, actions_path: str, csv_path: str, out_dir: str, out_format: str = "csv"
+    ) -> None:
         self.actions_df = pd.read_csv(actions_path, index_col=0)
         self.csv_path = csv_path
         self.out_dir = out_dir
+        self.out_format = out_format
 
     def merge_actions_trajectories(
         self,
@@ -50,13 +58,15 @@ class ActionsMerger:
     def run(self) -> Dict:
         split_path = self.csv_path.split("/")
         scenario_id, file_name = split_path[-2], split_path[-1]
+        # actions are labeled with the raw csv file names
+        file_name = get_trajectories_file_name(file_name, "csv")
         actions_df_fn = self.actions_df.groupby("file_name")
         if file_name not in actions_df_fn.groups.keys():
             return
         file_actions = actions_df_fn.get_group(file_name)
         if len(file_actions["ag_id"].unique()) == 0:
             return
-        trajectories_df = pd.read_csv(self.csv_path)
+        trajectories_df = load_trajectories_file(self.csv_path).reset_index()
         humans_trajectories_df = trajectories_df[
             trajectories_df.ag_id.str.startswith("Helmet")
         ]
@@ -65,5 +75,13 @@ class ActionsMerger:
             file_actions=file_actions,
         )
         create_dir(os.path.join(self.out_dir, scenario_id))
-        actions_trajs_merged.to_csv(os.path.join(self.out_dir, scenario_id, file_name))
+        dump_trajectories_file(
+            actions_trajs_merged,
+            os.path.join(
+                self.out_dir,
+                scenario_id,
+                get_trajectories_file_name(file_name, self.out_format),
+            ),
+            self.out_format,
+        )
         LOGGER.info("%s merged and saved!", file_name)
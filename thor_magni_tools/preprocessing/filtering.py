@@ -3,28 +3,16 @@ import pandas as pd
 import numpy as np
 from scipy.spatial.transform import Rotation
 
+from ..utils.columns import AXES, get_columns_layout
+from ..utils.schema import apply_trajectories_schema
+
 
 class Filterer3DOF:
     @staticmethod
     def get_best_markers(input_df: pd.DataFrame) -> pd.DataFrame:
         """Get markers with lowest amount of NaN values"""
-        x_coordinate = input_df[input_df.columns[input_df.columns.str.endswith("X")]]
-        x_cols = x_coordinate.columns
-
-        instances = set(x_coordinate.columns.str.split(" - ").str[0])
-        instances = list(filter(lambda x: len(x.split(" ")) == 1, instances))
-        nan_counter_by_marker = {}
-        for instance_id in instances:
-            nan_counter_by_marker[instance_id] = {}
-            markers = (
-                x_coordinate[x_cols[x_cols.str.startswith(f"{instance_id} -")]]
-                .columns.str.split(regex=r" (/d) ")
-                .str[2]
-            )
-            for marker_id in markers:
-                n_nans = x_coordinate[f"{instance_id} - {marker_id} X"].isna().sum()
-                nan_counter_by_marker[instance_id][marker_id] = n_nans
-        return nan_counter_by_marker
+        columns_layout = get_columns_layout(input_df.columns)
+        return columns_layout.count_markers_nans(input_df, axis="X")
 
     @staticmethod
     def reorganize_df(
@@ -112,76 +100,94 @@ class Filterer3DOF:
             elements_filtered_by_best_marker.append(out_df)
         out_df = pd.concat(elements_filtered_by_best_marker, axis=0)
         out_df = out_df.sort_index()
-        return out_df
+        return apply_trajectories_schema(out_df)
 
     @staticmethod
     def restore_markers(input_df: pd.DataFrame, roles: dict) -> pd.DataFrame:
-        """Restore markers based on the average tracked location
+        """Restore markers based on the average tracked location. The markers
+        columns are gathered into a (frames, bodies, markers, axes) array and
+        averaged ignoring NaNs in a single pass
         Output:
-        |Time|frame_id|ag_id|x|y|z|agent_type|marker_id
-
-        marker_id column -> best marker based on the argmin(NaNs)
+        |Time|frame_id|ag_id|x|y|z|agent_type
 
         Parameters
         ----------
         input_df
             raw_df
-        nan_counter_by_marker
-            counter of number of NaNs per marker
         roles
             ongoing activity wrt the trajectory
         Returns
         -------
             Filtered DataFrame
         """
-        instances = set(input_df.columns.str.split(" - ").str[0])
-        instances = list(filter(lambda x: len(x.split(" ")) == 1, instances))
-        dfs_restored = []
-        for instance_id in instances:
-            if instance_id == "Frame":
-                continue
-            instance_df = input_df[
-                ["Frame"]
-                + input_df.columns[
-                    input_df.columns.str.startswith(f"{instance_id} ")
-                ].tolist()
-            ]
-            instance_cols = instance_df.columns
-            new_axes_df = {f"{instance_id} {axis}": None for axis in ["X", "Y", "Z"]}
-            for axis in [" X", " Y", " Z"]:
-                axis_df = instance_df[
-                    instance_cols[instance_df.columns.str.endswith(axis)]
-                ]
-                axis_mean = axis_df.mean(axis=1, skipna=True, numeric_only=True)
-                new_axes_df[f"{instance_id}{axis}"] = axis_mean
-            new_axes_df = pd.DataFrame.from_dict(new_axes_df)
-            new_axes_df["Frame"] = instance_df["Frame"]
-            out_df = Filterer3DOF.reorganize_df(
-                new_axes_df, instance_id, roles[instance_id]
-            )
-            dfs_restored.append(out_df)
-        out_df = pd.concat(dfs_restored, axis=0)
-        out_df = out_df.sort_index()
-        return out_df
+        columns_layout = get_columns_layout(input_df.columns)
+        instances = columns_layout.instances
+        markers_positions = columns_layout.get_markers_positions(instances)
+
+        # only the markers columns are copied, the padding points to a NaN column
+        used_positions = np.unique(markers_positions[markers_positions >= 0])
+        markers_values = np.full((len(input_df), len(used_positions) + 1), np.NaN)
+        markers_values[:, :-1] = input_df.iloc[:, used_positions].to_numpy(
+            dtype=np.float64
+        )
+        markers_positions = np.where(
+            markers_positions >= 0,
+            np.searchsorted(used_positions, markers_positions),
+            len(used_positions),
+        )
+
+        markers_tensor = markers_values[:, markers_positions]
+        tracked_mask = ~np.isnan(markers_tensor)
+        n_tracked = tracked_mask.sum(axis=2)
+        markers_sum = np.where(tracked_mask, markers_tensor, 0.0).sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            restored_locations = np.where(
+                n_tracked > 0, markers_sum / n_tracked, np.NaN
+            )  # (frames, bodies, axes)
+
+        n_frames, n_instances = len(input_df), len(instances)
+        instances_ids = np.tile(np.arange(n_instances), n_frames)
+        restored_locations = restored_locations.reshape(-1, len(AXES))
+        out_df = pd.DataFrame(
+            {
+                "frame_id": np.repeat(input_df["Frame"].to_numpy(), n_instances),
+                "ag_id": pd.Categorical(instances).take(instances_ids),
+                "x": restored_locations[:, 0],
+                "y": restored_locations[:, 1],
+                "z": restored_locations[:, 2],
+                "agent_type": pd.Categorical(
+                    [roles[instance_id] for instance_id in instances]
+                ).take(instances_ids),
+            },
+            index=input_df.index.repeat(n_instances),
+        )
+        if not input_df.index.is_monotonic_increasing:
+            out_df = out_df.sort_index(kind="stable")
+        return apply_trajectories_schema(out_df)
 
 
 class Filterer6DOF:
     @staticmethod
-    def rotation_matrix_to_euler(row):
-        rot_matrix = np.array(
-            [
-                [row["rot_0"], row["rot_3"], row["rot_6"]],
-                [row["rot_1"], row["rot_4"], row["rot_7"]],
-                [row["rot_2"], row["rot_5"], row["rot_8"]],
-            ]
-        )
-        if np.all(np.isnan(rot_matrix)):
-            euler_angles = np.array([np.NaN, np.NaN, np.NaN])
-        else:
-            euler_angles = Rotation.from_matrix(rot_matrix).as_euler(
-                "zyx", degrees=True
-            )
-        return pd.Series(euler_angles, index=["rot_yaw", "rot_pitch", "rot_roll"])
+    def rotation_matrices_to_euler(rot_values: np.ndarray) -> np.ndarray:
+        """Euler angles (scipy's "zyx" sequence) of a batch of rotation matrices
+
+        Parameters
+        ----------
+        rot_values
+            (N, 9) array with the rot_0, ..., rot_8 columns (column-major matrices)
+
+        Returns
+        -------
+            (N, 3) array with yaw, pitch and roll in degrees, NaN for untracked rows
+        """
+        rot_matrices = rot_values.reshape(-1, 3, 3).transpose(0, 2, 1)
+        euler_angles = np.full((len(rot_values), 3), np.NaN)
+        tracked_mask = ~np.isnan(rot_values).all(axis=1)
+        if tracked_mask.any():
+            euler_angles[tracked_mask] = Rotation.from_matrix(
+                rot_matrices[tracked_mask]
+            ).as_euler("zyx", degrees=True)
+        return euler_angles
 
     @staticmethod
     def extract_columns(
@@ -252,11 +258,14 @@ class Filterer6DOF:
                         )
                     )
             out_df = pd.DataFrame(df_dict)
-            out_df[["rot_yaw", "rot_pitch", "rot_roll"]] = out_df.apply(
-                Filterer6DOF.rotation_matrix_to_euler, axis=1
+            rot_cols = [f"rot_{i}" for i in range(9)]
+            out_df[["rot_yaw", "rot_pitch", "rot_roll"]] = (
+                Filterer6DOF.rotation_matrices_to_euler(
+                    out_df[rot_cols].to_numpy(dtype=np.float64)
+                )
             )
-            out_df = out_df.drop(columns=[f"rot_{i}" for i in range(9)])
+            out_df = out_df.drop(columns=rot_cols)
             agents_reorganized.append(out_df)
         out_df = pd.concat(agents_reorganized, axis=0)
         out_df = out_df.sort_index()
-        return out_df
+        return apply_trajectories_schema(out_df)
@@ -0,0 +1,91 @@
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+FRAME_RATE_HZ = 100  # THOR-Magni mocap frame rate
+
+
+def get_frame_ticks(times: np.ndarray, frame_rate: int = FRAME_RATE_HZ) -> np.ndarray:
+    """timestamps in seconds -> integer frame ticks"""
+    return np.rint(np.asarray(times, dtype=np.float64) * frame_rate).astype(np.int64)
+
+
+def is_frame_multiple(period: str, frame_rate: int = FRAME_RATE_HZ) -> bool:
+    """whether a period, e.g. "400ms", is a whole number of frames"""
+    n_frames = pd.Timedelta(period).value * frame_rate / 1e9
+    return float(n_frames).is_integer() and n_frames >= 1
+
+
+def get_frame_stride(period: str, frame_rate: int = FRAME_RATE_HZ) -> int:
+    """period, e.g. "400ms" -> number of frames"""
+    if not is_frame_multiple(period, frame_rate):
+        raise ValueError(f"{period} is not a multiple of the frame period")
+    return int(pd.Timedelta(period).value * frame_rate // 1e9)
+
+
+def resample_first(
+    ticks: np.ndarray, values: np.ndarray, stride: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """First non-NaN value of each column within bins of `stride` frames starting
+    at the first tick, as `resample(rule).first()`
+
+    Parameters
+    ----------
+    ticks
+        (N,) sorted frame ticks
+    values
+        (N, C) array
+    stride
+        bins size in frames
+
+    Returns
+    -------
+        (B,) ticks of the bins starts and (B, C) resampled values, NaN for empty
+        bins
+    """
+    n_rows = len(ticks)
+    bins = (ticks - ticks[0]) // stride
+    n_bins = bins[-1] + 1
+    bins_starts = np.searchsorted(bins, np.arange(n_bins))
+    bins_ends = np.append(bins_starts[1:], n_rows)
+    non_empty = bins_ends > bins_starts
+
+    rows_ids = np.where(~np.isnan(values), np.arange(n_rows)[:, None], n_rows)
+    first_rows = np.full((n_bins, values.shape[1]), n_rows)
+    first_rows[non_empty] = np.minimum.reduceat(
+        rows_ids, bins_starts[non_empty], axis=0
+    )
+    bins_rows, cols = np.nonzero(first_rows < bins_ends[:, None])
+    resampled = np.full(first_rows.shape, np.NaN, dtype=values.dtype)
+    resampled[bins_rows, cols] = values[first_rows[bins_rows, cols], cols]
+    return ticks[0] + np.arange(n_bins) * stride, resampled
+
+
+def moving_average(ticks: np.ndarray, values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the non-NaN values in the past `window` frames (t - window, t] of
+    each row, computed with cumulative sums
+
+    Parameters
+    ----------
+    ticks
+        (N,) sorted frame ticks
+    values
+        (N, C) array
+    window
+        window size in frames
+
+    Returns
+    -------
+        (N, C) float64 array
+    """
+    windows_starts = np.searchsorted(ticks, ticks - window, side="right")
+    tracked_mask = ~np.isnan(values)
+    values_cumsum = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(np.where(tracked_mask, values, 0.0), axis=0, out=values_cumsum[1:])
+    tracked_cumsum = np.zeros(values_cumsum.shape, dtype=np.int64)
+    np.cumsum(tracked_mask, axis=0, out=tracked_cumsum[1:])
+
+    windows_sum = values_cumsum[1:] - values_cumsum[windows_starts]
+    windows_count = tracked_cumsum[1:] - tracked_cumsum[windows_starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(windows_count > 0, windows_sum / windows_count, np.NaN)
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def interpolate_gaps(
+    values: np.ndarray, groups_starts: np.ndarray, max_consecutive_nans: int
+) -> np.ndarray:
+    """Linear interpolation of the NaN gaps with at most `max_consecutive_nans`
+    values, for all the columns and all the groups (e.g. agents) at once.
+    It follows `pd.Series.interpolate(method="linear")`: leading NaNs are kept and
+    trailing NaNs take the last tracked value.
+
+    Parameters
+    ----------
+    values
+        (N, C) array, rows of each group are contiguous and sorted in time
+    groups_starts
+        sorted index of the first row of each group, starting at 0
+    max_consecutive_nans
+        max size of the gaps to interpolate
+
+    Returns
+    -------
+        (N, C) float64 array with the interpolated values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows = len(values)
+    if n_rows == 0:
+        return values.copy()
+    groups_ends = np.append(groups_starts[1:], n_rows)
+    rows_group = np.repeat(np.arange(len(groups_starts)), groups_ends - groups_starts)
+    rows_start = groups_starts[rows_group][:, None]
+    rows_end = groups_ends[rows_group][:, None]
+
+    # previous/next tracked row of each cell within its group (start - 1/end if none)
+    rows_ids = np.arange(n_rows)[:, None]
+    tracked = ~np.isnan(values)
+    prev_tracked = np.maximum.accumulate(
+        np.where(tracked, rows_ids, rows_start - 1), axis=0
+    )
+    next_tracked = np.minimum.accumulate(
+        np.where(tracked, rows_ids, rows_end)[::-1], axis=0
+    )[::-1]
+
+    gaps_size = next_tracked - prev_tracked - 1
+    to_fill = ~tracked & (prev_tracked >= rows_start) & (gaps_size <= max_consecutive_nans)
+    inside_mask = to_fill & (next_tracked < rows_end)
+    trailing_mask = to_fill & ~inside_mask
+
+    interpolated = values.copy()
+    rows, cols = np.nonzero(inside_mask)
+    left, right = prev_tracked[rows, cols], next_tracked[rows, cols]
+    left_values = values[left, cols]
+    slopes = (values[right, cols] - left_values) / (right - left).astype(np.float64)
+    interpolated[rows, cols] = slopes * (rows - left).astype(np.float64) + left_values
+
+    rows, cols = np.nonzero(trailing_mask)
+    interpolated[rows, cols] = values[prev_tracked[rows, cols], cols]
+    return interpolated
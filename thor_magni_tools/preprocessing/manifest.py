@@ -0,0 +1,64 @@
+import os
+import json
+import hashlib
+from typing import Optional
+
+from ..io import dump_json_file, load_json_file
+from ..utils.cache import RawRecordingsCache
+
+
+class PreprocessingManifest:
+    """Manifest of the preprocessed files, used to skip the files whose raw input,
+    config and output did not change since the last run:
+    {raw file path: {size, mtime_ns, input_hash, config_hash, out_path}}
+    """
+
+    def __init__(self, manifest_path: str) -> None:
+        self.manifest_path = manifest_path
+        self.entries = (
+            load_json_file(manifest_path) if os.path.exists(manifest_path) else {}
+        )
+
+    @staticmethod
+    def get_config_hash(config: dict) -> str:
+        return hashlib.sha1(
+            json.dumps(config, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def get_input_hash(self, path: str) -> Optional[str]:
+        """content hash of the raw file, only recomputed if its size or modification
+        time changed"""
+        entry = self.entries.get(os.path.abspath(path))
+        stat = os.stat(path)
+        if entry and (entry["size"], entry["mtime_ns"]) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            return entry["input_hash"]
+        return RawRecordingsCache.get_content_hash(path)
+
+    def is_up_to_date(self, path: str, config_hash: str, out_path: str) -> bool:
+        entry = self.entries.get(os.path.abspath(path))
+        return (
+            entry is not None
+            and entry["config_hash"] == config_hash
+            and entry["out_path"] == out_path
+            and os.path.exists(out_path)
+            and entry["input_hash"] == self.get_input_hash(path)
+        )
+
+    def update(self, path: str, config_hash: str, out_path: str) -> None:
+        stat = os.stat(path)
+        self.entries[os.path.abspath(path)] = dict(
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            input_hash=self.get_input_hash(path),
+            config_hash=config_hash,
+            out_path=out_path,
+        )
+
+    def dump(self) -> None:
+        """atomic write of the manifest"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        dump_json_file(self.entries, tmp_path)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,304 @@
+import time
+from collections import deque
+from typing import Iterator, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from ..utils.columns import get_columns_layout
+from ..utils.load import load_header_magni, preprocessing_header_magni
+
+
+class OnlineTrajectoriesReprocessor:
+    """Frame by frame version of `TrajectoriesReprocessor` for live streams.
+
+    Frames (or small batches of frames) with the THOR-Magni csv layout are pushed
+    and the long format rows |Time|frame_id|ag_id|x|y|z|agent_type are emitted once
+    their values are final:
+        - 3D-best_marker: marker with the lowest number of NaNs so far
+        - 3D-restoration: average of the tracked markers
+        - gaps of at most `max_nans_interpolate` frames are linearly interpolated,
+        i.e. frames are held back at most `max_nans_interpolate` frames
+        - optional moving average over the past `average_window`
+    Memory is bounded by the look-back buffer and the averaging window.
+    """
+
+    PREPROCESSING_TYPES = ("3D-best_marker", "3D-restoration")
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        roles: dict,
+        preprocessing_type: str,
+        max_nans_interpolate: Optional[int],
+        average_window: Optional[str] = None,
+    ) -> None:
+        if preprocessing_type not in self.PREPROCESSING_TYPES:
+            raise ValueError(
+                f"Preprocessing type {preprocessing_type} not supported online. "
+                f"Options: {self.PREPROCESSING_TYPES}"
+            )
+        self.pp_type = preprocessing_type
+        self.max_nans_interpolate = max_nans_interpolate or 0
+        self.window_ns = pd.Timedelta(average_window).value if average_window else None
+
+        columns_layout = get_columns_layout(columns)
+        self.instances = [
+            instance_id
+            for instance_id in columns_layout.instances
+            if instance_id in roles
+        ]
+        markers_positions = columns_layout.get_markers_positions(self.instances)
+        # padding points to an extra NaN column
+        self.markers_positions = np.where(
+            markers_positions >= 0, markers_positions, len(columns)
+        )
+        self.valid_markers = markers_positions[..., 0] >= 0
+        self.markers_ids = np.full(markers_positions.shape[:2], None, dtype=object)
+        for i, instance_id in enumerate(self.instances):
+            instance_markers = list(columns_layout.markers[instance_id])
+            self.markers_ids[i, : len(instance_markers)] = instance_markers
+        self.agents_types = [roles[instance_id] for instance_id in self.instances]
+        self.ag_id_dtype = pd.CategoricalDtype(sorted(self.instances))
+        self.agent_type_dtype = pd.CategoricalDtype(sorted(set(self.agents_types)))
+
+        n_instances, n_axes = len(self.instances), markers_positions.shape[2]
+        self.markers_nans = np.zeros(markers_positions.shape[:2], dtype=np.int64)
+        self.n_frames = 0
+        self.last_frame = None
+        self.last_tracked_pos = np.full((n_instances, n_axes), -1, dtype=np.int64)
+        self.last_tracked_values = np.full((n_instances, n_axes), np.NaN)
+        self.buffer = deque()  # frames waiting for their gaps to be closed
+        self.window = deque()  # frames in the averaging window
+
+    def filter_frames(self, frames: pd.DataFrame):
+        """(frames, instances, axes) locations and best markers ids (or None)"""
+        raw_values = np.full((len(frames), frames.shape[1] + 1), np.NaN)
+        raw_values[:, :-1] = frames.to_numpy(dtype=np.float64)
+        markers_tensor = raw_values[:, self.markers_positions]
+        best_markers_ids = None
+        if self.pp_type == "3D-best_marker":
+            markers_nans = self.markers_nans + np.cumsum(
+                np.isnan(markers_tensor[..., 0]), axis=0
+            )
+            self.markers_nans = markers_nans[-1]
+            best_markers = np.argmin(
+                np.where(self.valid_markers, markers_nans, np.inf), axis=2
+            )
+            frames_ids = np.arange(len(frames))[:, None]
+            instances_ids = np.arange(len(self.instances))[None, :]
+            locations = markers_tensor[frames_ids, instances_ids, best_markers]
+            best_markers_ids = self.markers_ids[instances_ids, best_markers]
+        else:
+            tracked_mask = ~np.isnan(markers_tensor)
+            n_tracked = tracked_mask.sum(axis=2)
+            markers_sum = np.where(tracked_mask, markers_tensor, 0.0).sum(axis=2)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                locations = np.where(n_tracked > 0, markers_sum / n_tracked, np.NaN)
+        # same precision as the offline filterers output
+        return locations.astype(np.float32).astype(np.float64), best_markers_ids
+
+    def add_frame(self, frame: dict) -> None:
+        """buffer a frame and interpolate the gaps it closes"""
+        pos, locations = self.n_frames, frame["locations"]
+        tracked = ~np.isnan(locations)
+        gaps_size = pos - self.last_tracked_pos - 1
+        to_fill = (
+            tracked
+            & (self.last_tracked_pos >= 0)
+            & (gaps_size > 0)
+            & (gaps_size <= self.max_nans_interpolate)
+        )
+        for i, j in zip(*np.nonzero(to_fill)):
+            left = self.last_tracked_pos[i, j]
+            left_value = self.last_tracked_values[i, j]
+            slope = (locations[i, j] - left_value) / np.float64(pos - left)
+            for gap_pos in range(left + 1, pos):
+                buffered_frame = self.buffer[gap_pos - self.buffer[0]["pos"]]
+                buffered_frame["locations"][i, j] = (
+                    slope * np.float64(gap_pos - left) + left_value
+                )
+        self.last_tracked_pos[tracked] = pos
+        self.last_tracked_values[tracked] = locations[tracked]
+        frame["pos"] = pos
+        self.buffer.append(frame)
+        self.n_frames += 1
+
+    def is_final(self, frame: dict) -> bool:
+        """untracked values are final if there is no previous tracked value, the
+        gap is closed or the gap is already longer than `max_nans_interpolate`"""
+        untracked = np.isnan(frame["locations"])
+        closed = (
+            (self.last_tracked_pos < 0)
+            | (self.last_tracked_pos > frame["pos"])
+            | (self.n_frames - 1 - self.last_tracked_pos > self.max_nans_interpolate)
+        )
+        return not (untracked & ~closed).any()
+
+    def smooth(self, frame: dict) -> dict:
+        """moving average over the frames in (t - average_window, t]"""
+        if self.window_ns is None:
+            return frame
+        self.window.append((frame["time_ns"], frame["locations"].copy()))
+        while self.window[0][0] <= frame["time_ns"] - self.window_ns:
+            self.window.popleft()
+        window_locations = np.stack([locations for _, locations in self.window])
+        tracked_mask = ~np.isnan(window_locations)
+        n_tracked = tracked_mask.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frame["locations"] = np.where(
+                n_tracked > 0,
+                np.where(tracked_mask, window_locations, 0.0).sum(axis=0) / n_tracked,
+                np.NaN,
+            )
+        return frame
+
+    def to_dataframe(self, frames: List[dict]) -> pd.DataFrame:
+        """long format rows, agents of each frame in the recording order"""
+        n_instances = len(self.instances)
+        instances_ids = np.tile(np.arange(n_instances), len(frames))
+        locations = np.array([frame["locations"] for frame in frames]).reshape(-1, 3)
+        out_df = pd.DataFrame(
+            {
+                "frame_id": np.repeat(
+                    np.array([frame["frame_id"] for frame in frames], dtype=np.int32),
+                    n_instances,
+                ),
+                "ag_id": pd.Categorical(
+                    np.array(self.instances, dtype=object)[instances_ids],
+                    dtype=self.ag_id_dtype,
+                ),
+                "x": locations[:, 0].astype(np.float32),
+                "y": locations[:, 1].astype(np.float32),
+                "z": locations[:, 2].astype(np.float32),
+                "agent_type": pd.Categorical(
+                    np.array(self.agents_types, dtype=object)[instances_ids],
+                    dtype=self.agent_type_dtype,
+                ),
+            },
+            index=pd.Index(
+                np.repeat([frame["time"] for frame in frames], n_instances),
+                dtype=np.float64,
+                name="Time",
+            ),
+        )
+        if self.pp_type == "3D-best_marker":
+            out_df["best_marker_id"] = (
+                np.concatenate([frame["best_markers_ids"] for frame in frames])
+                if frames
+                else np.array([], dtype=object)
+            )
+        return out_df
+
+    def push(self, frames: pd.DataFrame) -> pd.DataFrame:
+        """Feed new frames
+
+        Parameters
+        ----------
+        frames
+            raw frames indexed by Time with the columns of the recording (Frame,
+            markers, ...). Repeated frames are dropped
+
+        Returns
+        -------
+            long format rows of the frames whose values are final
+        """
+        frames_ids = frames["Frame"].to_numpy()
+        if self.last_frame is not None:
+            new_mask = frames_ids > self.last_frame
+            frames, frames_ids = frames[new_mask], frames_ids[new_mask]
+        keep_mask = np.ones(len(frames_ids), dtype=bool)
+        keep_mask[1:] = frames_ids[1:] > np.maximum.accumulate(frames_ids)[:-1]
+        frames, frames_ids = frames[keep_mask], frames_ids[keep_mask]
+        if len(frames) == 0:
+            return self.to_dataframe([])
+        self.last_frame = frames_ids[-1]
+
+        locations, best_markers_ids = self.filter_frames(frames)
+        times = frames.index.to_numpy(dtype=np.float64)
+        times_ns = pd.TimedeltaIndex(times, unit="s").asi8
+        ready_frames = []
+        for i in range(len(frames)):
+            self.add_frame(
+                dict(
+                    time=times[i],
+                    time_ns=times_ns[i],
+                    frame_id=frames_ids[i],
+                    locations=locations[i],
+                    best_markers_ids=(
+                        best_markers_ids[i] if best_markers_ids is not None else None
+                    ),
+                )
+            )
+            while self.buffer and self.is_final(self.buffer[0]):
+                ready_frames.append(self.smooth(self.buffer.popleft()))
+        return self.to_dataframe(ready_frames)
+
+    def flush(self) -> pd.DataFrame:
+        """End of the stream: trailing gaps of at most `max_nans_interpolate` frames
+        take the last tracked value (as the offline interpolation) and all the
+        buffered frames are emitted"""
+        trailing_size = self.n_frames - 1 - self.last_tracked_pos
+        ready_frames = []
+        while self.buffer:
+            frame = self.buffer.popleft()
+            to_fill = (
+                np.isnan(frame["locations"])
+                & (self.last_tracked_pos >= 0)
+                & (self.last_tracked_pos < frame["pos"])
+                & (trailing_size <= self.max_nans_interpolate)
+            )
+            frame["locations"][to_fill] = self.last_tracked_values[to_fill]
+            ready_frames.append(self.smooth(frame))
+        return self.to_dataframe(ready_frames)
+
+
+def replay_recording(
+    csv_path: str,
+    preprocessing_type: str,
+    max_nans_interpolate: Optional[int],
+    average_window: Optional[str] = None,
+    batch_size: int = 1,
+    speed: Optional[float] = 1.0,
+    header_size: int = 16,
+) -> Iterator[pd.DataFrame]:
+    """Replay a THOR-Magni recording through `OnlineTrajectoriesReprocessor`,
+    `batch_size` frames at a time
+
+    Parameters
+    ----------
+    speed
+        replay speed wrt real time, None or 0 to replay as fast as possible
+
+    Returns
+    -------
+        iterator over the rows emitted after each batch (and the final flush)
+    """
+    header_dict, _ = load_header_magni(csv_path, header_size)
+    traj_metadata = preprocessing_header_magni(header_dict)["SENSOR_DATA"][
+        "TRAJECTORIES"
+    ]["METADATA"]
+    roles = {
+        body_name: metadata["ROLE"] for body_name, metadata in traj_metadata.items()
+    }
+    reader = pd.read_csv(
+        csv_path, skiprows=header_size, header=0, index_col=1, chunksize=batch_size
+    )
+    processor, start_time, start_ts = None, time.monotonic(), None
+    for frames in reader:
+        if processor is None:
+            processor = OnlineTrajectoriesReprocessor(
+                frames.columns,
+                roles,
+                preprocessing_type,
+                max_nans_interpolate,
+                average_window,
+            )
+            start_ts = frames.index[0]
+        if speed:
+            elapsed_time = time.monotonic() - start_time
+            delay = (frames.index[-1] - start_ts) / speed - elapsed_time
+            if delay > 0:
+                time.sleep(delay)
+        yield processor.push(frames)
+    if processor is not None:
+        yield processor.flush()
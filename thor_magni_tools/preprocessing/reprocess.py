@@ -1,12 +1,29 @@
 import os
 import logging
-from typing import Optional, List
+from typing import Optional, List, Tuple
+import numpy as np
 import pandas as pd
 
 from .filtering import Filterer3DOF, Filterer6DOF
-from ..utils.load import load_csv_metadata_magni, preprocessing_header_magni
+from .interpolation import interpolate_gaps
+from .frame_grid import (
+    FRAME_RATE_HZ,
+    get_frame_ticks,
+    get_frame_stride,
+    is_frame_multiple,
+    resample_first,
+    moving_average,
+)
+from ..utils.load import (
+    load_csv_metadata_magni,
+    load_header_magni,
+    preprocessing_header_magni,
+)
+from ..utils.cache import RawRecordingsCache
+from ..utils.partition import AgentsPartition
+from ..utils.profiling import StageProfiler
 from ..data_tests.logger import CustomFormatter
-from ..io import create_dir
+from ..io import create_dir, dump_trajectories_file, get_trajectories_file_name
 
 
 LOGGER = logging.getLogger(__name__)
@@ -18,79 +35,168 @@ LOGGER.addHandler(ch)
 
 
 class TrajectoriesReprocessor:
+    # measured peak memory / (frames x parsed columns x 8 bytes)
+    PEAK_MEMORY_FACTORS = {"3D-best_marker": 5, "3D-restoration": 6, "6D": 9}
+    CSV_BYTES_PER_VALUE = 8
+
     def __init__(
         self,
         csv_path: str,
         out_path: str,
         preprocessing_type: str,
         max_nans_interpolate: int,
+        cache: Optional[RawRecordingsCache] = None,
+        float_dtype: Optional[str] = None,
+        out_format: str = "csv",
+        profile: bool = False,
+        profile_memory: bool = False,
         **kwargs,
     ) -> None:
         self.csv_path = csv_path
         self.out_dir = out_path
         self.pp_type = preprocessing_type
         self.max_nans_interpolate = max_nans_interpolate
+        self.cache = cache
+        self.float_dtype = float_dtype
+        self.out_format = out_format
+        self.profile = profile
+        self.profile_memory = profile_memory
+        self.profiler = StageProfiler(enabled=profile, trace_memory=profile_memory)
         self.args = kwargs
 
-    @staticmethod
-    def interpolate_with_rule(
-        input_df: pd.DataFrame, column_name: str, max_consecutive_nans: int
-    ) -> pd.DataFrame:
-        """interpolate given a max number of consecutive nans"""
-        mask = input_df[column_name].isna()
-        groups = mask.ne(mask.shift()).cumsum()
-
-        interpolated_column = input_df[column_name].interpolate(method="linear")
-
-        interpolated_column = interpolated_column.where(
-            groups.groupby(groups).transform("size") <= max_consecutive_nans,
-            input_df[column_name],
-        )
-
-        input_df[column_name] = interpolated_column
-        return input_df
-
     @staticmethod
     def interpolate(
         input_df: pd.DataFrame, faulty_columns: List[str], max_nans_interpolate: int
     ):
-        for col_name in faulty_columns:
-            input_df = TrajectoriesReprocessor.interpolate_with_rule(
-                input_df, col_name, max_nans_interpolate
-            )
+        """interpolate the gaps of at most `max_nans_interpolate` NaNs of all the
+        `faulty_columns`, independently for each agent (`ag_id`) if present. All
+        the columns and agents are interpolated in a single array pass"""
+        rows_order, groups_starts = np.arange(len(input_df)), np.zeros(1, dtype=int)
+        if "ag_id" in input_df.columns:
+            partition = AgentsPartition(input_df)
+            # rows without agent, if any, are gathered in a first group
+            rows_order = partition.order
+            groups_starts = np.union1d(groups_starts, partition.starts)
+        values = input_df[faulty_columns].to_numpy(dtype=np.float64)[rows_order]
+        interpolated = np.empty_like(values)
+        interpolated[rows_order] = interpolate_gaps(
+            values, groups_starts, max_nans_interpolate
+        )
+        input_df = input_df.copy()
+        for i, col_name in enumerate(faulty_columns):
+            input_df[col_name] = interpolated[:, i].astype(input_df[col_name].dtype)
         LOGGER.debug("interpolation applied!")
         return input_df
 
     @staticmethod
-    def resample(input_df: pd.DataFrame, faulty_columns: List[str], rule: str):
-        target_agent_resample = input_df.copy()[["frame_id"] + faulty_columns]
-        target_agent_resample.index = pd.TimedeltaIndex(
-            target_agent_resample.index, unit="s"
+    def resample_and_smooth(
+        input_df: pd.DataFrame,
+        faulty_columns: List[str],
+        resampling_rule: Optional[str] = None,
+        average_window: Optional[str] = None,
+        frame_rate: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Resampling (first value of each `resampling_rule` bin) and moving average
+        (mean over the past `average_window`) of a single agent. Data recorded at a
+        known `frame_rate` (Hz) is processed in one pass over the frame grid, i.e.
+        integer frame strides and cumulative sums windows, if the periods are whole
+        numbers of frames. Otherwise the time-based pandas `resample` and `rolling`
+        are used.
+
+        Returns
+        -------
+            DataFrame |Time|frame_id|faulty_columns
+        """
+        periods = [period for period in (resampling_rule, average_window) if period]
+        if frame_rate is None or not all(
+            is_frame_multiple(period, frame_rate) for period in periods
+        ):
+            return TrajectoriesReprocessor.resample_and_smooth_time(
+                input_df, faulty_columns, resampling_rule, average_window
+            )
+        times = input_df.index.to_numpy(dtype=np.float64)
+        ticks = get_frame_ticks(times, frame_rate)
+        frames = input_df["frame_id"].to_numpy()
+        values = input_df[faulty_columns].to_numpy(dtype=np.float64)
+        if resampling_rule:
+            ticks, resampled = resample_first(
+                ticks,
+                np.column_stack([frames.astype(np.float64), values]),
+                get_frame_stride(resampling_rule, frame_rate),
+            )
+            frames, values = resampled[:, 0], resampled[:, 1:]
+            if not np.isnan(frames).any():
+                frames = frames.astype(input_df["frame_id"].dtype)
+            times = ticks / frame_rate
+        if average_window:
+            values = moving_average(
+                ticks, values, get_frame_stride(average_window, frame_rate)
+            )
+        out_df = pd.DataFrame(
+            values,
+            index=pd.Index(times, name=input_df.index.name),
+            columns=faulty_columns,
         )
-        target_agent_resample = target_agent_resample.resample(rule=rule).first()
+        if not average_window:
+            out_df = out_df.astype(input_df[faulty_columns].dtypes.to_dict())
+        out_df.insert(0, "frame_id", frames)
+        return out_df
+
+    @staticmethod
+    def resample_and_smooth_time(
+        input_df: pd.DataFrame,
+        faulty_columns: List[str],
+        resampling_rule: Optional[str] = None,
+        average_window: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """`resample_and_smooth` with the time-based pandas `resample(rule).first()`
+        and `rolling(window).mean()`, for any frame rate and pandas periods (and
+        data without frame ids, e.g. ATC)"""
+        frame_cols = ["frame_id"] if "frame_id" in input_df.columns else []
+        out_df = input_df.copy()[frame_cols + faulty_columns]
+        out_df.index = pd.TimedeltaIndex(out_df.index, unit="s")
+        if resampling_rule:
+            out_df = out_df.resample(rule=resampling_rule).first()
+        if average_window:
+            out_df[faulty_columns] = (
+                out_df[faulty_columns].rolling(average_window).mean()
+            )
+        out_df.index = out_df.index.total_seconds()
+        return out_df
 
-        target_agent_resample.index = target_agent_resample.index.total_seconds()
+    @staticmethod
+    def resample(
+        input_df: pd.DataFrame,
+        faulty_columns: List[str],
+        rule: str,
+        frame_rate: Optional[int] = None,
+    ):
+        target_agent_resample = TrajectoriesReprocessor.resample_and_smooth(
+            input_df, faulty_columns, resampling_rule=rule, frame_rate=frame_rate
+        )
         LOGGER.debug("resampling applied!")
         return target_agent_resample
 
     @staticmethod
     def move_average_window(
-        input_df: pd.DataFrame, faulty_columns: List[str], window_size: str
+        input_df: pd.DataFrame,
+        faulty_columns: List[str],
+        window_size: str,
+        frame_rate: Optional[int] = None,
     ):
-        target_agent_smooth = input_df.copy()[["frame_id"] + faulty_columns]
-        target_agent_smooth.index = pd.TimedeltaIndex(
-            target_agent_smooth.index, unit="s"
-        )
-        target_agent_smooth[faulty_columns] = (
-            target_agent_smooth[faulty_columns].rolling(window_size).mean()
+        target_agent_smooth = TrajectoriesReprocessor.resample_and_smooth(
+            input_df, faulty_columns, average_window=window_size, frame_rate=frame_rate
         )
-        target_agent_smooth.index = target_agent_smooth.index.total_seconds()
         LOGGER.debug("average window applied!")
         return target_agent_smooth
 
     @staticmethod
     def reprocessing(
-        input_df: pd.DataFrame, max_nans_interpolate: Optional[int], **kwargs
+        input_df: pd.DataFrame,
+        max_nans_interpolate: Optional[int],
+        profiler: Optional[StageProfiler] = None,
+        frame_rate: Optional[int] = None,
+        **kwargs,
     ) -> pd.DataFrame:
         """Repreocessing tha dataframe: interpolation.
         Optionally: resampling + moving average filter
@@ -101,6 +207,11 @@ class TrajectoriesReprocessor:
             raw input dataframe
         max_nans_interpolate
             max number of untracked locations to be interpolated
+        profiler
+            optional profiler of the interpolation and resampling/smoothing stages
+        frame_rate
+            frame rate (Hz) of the recordings, enables the frame grid resampling and
+            smoothing (see `resample_and_smooth`)
 
         Returns
         -------
@@ -109,12 +220,32 @@ class TrajectoriesReprocessor:
         faulty_columns = input_df.columns[
             input_df.columns.str.startswith(("x", "y", "z", "rot"))
         ].tolist()
-        agents_in_scenario = input_df["ag_id"].unique()
         data_lbl_col = True if "agent_type" in input_df.columns else False
+        profiler = profiler or StageProfiler(enabled=False)
+        if max_nans_interpolate:
+            with profiler.stage("interpolation", rows_in=len(input_df)) as record:
+                input_df = TrajectoriesReprocessor.interpolate(
+                    input_df, faulty_columns, max_nans_interpolate
+                )
+                record["rows_out"] = len(input_df)
+        with profiler.stage("resampling_smoothing", rows_in=len(input_df)) as record:
+            interpolated_df = TrajectoriesReprocessor.reprocess_agents(
+                input_df, faulty_columns, data_lbl_col, frame_rate, **kwargs
+            )
+            record["rows_out"] = len(interpolated_df)
+        return interpolated_df
+
+    @staticmethod
+    def reprocess_agents(
+        input_df: pd.DataFrame,
+        faulty_columns: List[str],
+        data_lbl_col: bool,
+        frame_rate: Optional[int] = None,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """resampling and moving average of each agent"""
         agents_preprocessed = []
-        for agent_id in agents_in_scenario:
-            target_agent = input_df[input_df["ag_id"] == agent_id]
-            target_agent_rule_int = target_agent.copy()
+        for agent_id, target_agent_rule_int in AgentsPartition(input_df):
             if data_lbl_col:
                 agent_type = target_agent_rule_int["agent_type"].iloc[0]
             marker_id = (
@@ -122,19 +253,14 @@ class TrajectoriesReprocessor:
                 if "marker_id" in target_agent_rule_int.columns
                 else None
             )
-            if max_nans_interpolate:
-                target_agent_rule_int = TrajectoriesReprocessor.interpolate(
-                    target_agent_rule_int, faulty_columns, max_nans_interpolate
-                )
-            if kwargs["resampling_rule"]:
-                target_agent_rule_int = TrajectoriesReprocessor.resample(
-                    target_agent_rule_int, faulty_columns, kwargs["resampling_rule"]
-                )
-            if kwargs["average_window"]:
-                target_agent_rule_int = TrajectoriesReprocessor.move_average_window(
-                    target_agent_rule_int, faulty_columns, kwargs["average_window"]
-                )
             if kwargs["resampling_rule"] or kwargs["average_window"]:
+                target_agent_rule_int = TrajectoriesReprocessor.resample_and_smooth(
+                    target_agent_rule_int,
+                    faulty_columns,
+                    kwargs["resampling_rule"],
+                    kwargs["average_window"],
+                    frame_rate,
+                )
                 target_agent_rule_int["ag_id"] = agent_id
                 if data_lbl_col:
                     target_agent_rule_int["agent_type"] = agent_type
@@ -145,7 +271,9 @@ class TrajectoriesReprocessor:
         interpolated_df = pd.concat(agents_preprocessed, axis=0).sort_index()
         return interpolated_df
 
-    def get_target_columns_attributes(self, traj_metadata) -> dict:
+    def get_target_columns_attributes(
+        self, traj_metadata, preprocessing_type: Optional[str] = None
+    ) -> dict:
         target_agents = tuple(
             body_name
             for body_name, meta_data in traj_metadata.items()
@@ -153,7 +281,7 @@ class TrajectoriesReprocessor:
         )
 
         columns_suff = ("X", "Y", "Z")
-        if self.pp_type == "6D":
+        if (preprocessing_type or self.pp_type) == "6D":
             columns_axis = tuple(f"Centroid_{axis}" for axis in columns_suff)
             columns_rot = tuple(f"R{rot}" for rot in range(9))
             eytrackers = ("TB2", "TB3", "PPL")
@@ -170,52 +298,147 @@ class TrajectoriesReprocessor:
             target_columns_suffix=columns_suff,
         )
 
-    def run(self):
+    @staticmethod
+    def filter_target_columns(
+        columns: List[str], target_agents: Tuple[str], target_columns_suffix: Tuple[str]
+    ) -> List[str]:
+        return [
+            col
+            for col in columns
+            if (col.startswith(target_agents) and col.endswith(target_columns_suffix))
+        ]
+
+    def get_out_file_path(self) -> str:
         split_path = self.csv_path.split("/")
         scenario_id, file_name = split_path[-2], split_path[-1]
-        raw_df, header_dict = load_csv_metadata_magni(self.csv_path)
+        return os.path.join(
+            self.out_dir,
+            scenario_id,
+            get_trajectories_file_name(file_name, self.out_format),
+        )
+
+    def get_profile_path(self) -> str:
+        """profile stored next to the output file"""
+        return os.path.splitext(self.get_out_file_path())[0] + ".profile.json"
+
+    def get_profiles_paths(self) -> List[str]:
+        return [self.get_profile_path()]
+
+    def get_config(self) -> dict:
+        """parameters the output depends on"""
+        return dict(
+            preprocessing_type=self.pp_type,
+            max_nans_interpolate=self.max_nans_interpolate,
+            float_dtype=self.float_dtype,
+            out_format=self.out_format,
+            **self.args,
+        )
+
+    def estimate_peak_memory(self) -> int:
+        """Rough peak memory (bytes) of `run` from the header: number of frames (or
+        file size / number of columns if missing) x number of parsed columns"""
+        header_dict, columns = load_header_magni(self.csv_path)
         pp_header_dict = preprocessing_header_magni(header_dict)
         traj_metadata = pp_header_dict["SENSOR_DATA"]["TRAJECTORIES"]["METADATA"]
-
         target_columns_atts = self.get_target_columns_attributes(traj_metadata)
-        target_agents = target_columns_atts["target_agents"]
-        target_columns_suffix = target_columns_atts["target_columns_suffix"]
+        n_parsed_columns = 2 + len(
+            TrajectoriesReprocessor.filter_target_columns(
+                columns,
+                target_columns_atts["target_agents"],
+                target_columns_atts["target_columns_suffix"],
+            )
+        )
+        n_frames = pp_header_dict["SENSOR_DATA"]["TRAJECTORIES"]["N_FRAMES"]
+        if not isinstance(n_frames, int):
+            n_frames = os.path.getsize(self.csv_path) // (
+                len(columns) * self.CSV_BYTES_PER_VALUE
+            )
+        return n_frames * n_parsed_columns * 8 * self.PEAK_MEMORY_FACTORS[self.pp_type]
 
-        df = raw_df.dropna(axis=1, how="all")
-        filtered_columns = [
-            col
-            for col in df.columns
-            if (col.startswith(target_agents) and col.endswith(target_columns_suffix))
-        ]
-        target_data = df[["Frame"] + filtered_columns]
+    def load_target_data(
+        self, preprocessing_types: Optional[List[str]] = None
+    ) -> Tuple[pd.DataFrame, dict, Tuple[str]]:
+        """Parse the columns of the target agents needed by the preprocessing
+        type(s), by default the one of this reprocessor
+
+        Returns
+        -------
+            raw target data, agents roles and target agents
+        """
+        with self.profiler.stage("load") as record:
+            header_dict, columns = load_header_magni(self.csv_path)
+            pp_header_dict = preprocessing_header_magni(header_dict)
+            traj_metadata = pp_header_dict["SENSOR_DATA"]["TRAJECTORIES"]["METADATA"]
+
+            target_columns_suffix = ()
+            for preprocessing_type in preprocessing_types or [self.pp_type]:
+                target_columns_atts = self.get_target_columns_attributes(
+                    traj_metadata, preprocessing_type
+                )
+                target_columns_suffix += target_columns_atts["target_columns_suffix"]
+            target_agents = target_columns_atts["target_agents"]
+
+            # only the columns of the target agents are parsed
+            raw_df, _ = load_csv_metadata_magni(
+                self.csv_path,
+                cache=self.cache,
+                usecols=TrajectoriesReprocessor.filter_target_columns(
+                    columns, target_agents, target_columns_suffix
+                ),
+                float_dtype=self.float_dtype,
+            )
+            record["rows_out"] = len(raw_df)
+        with self.profiler.stage("column_filtering", rows_in=len(raw_df)) as record:
+            df = raw_df.dropna(axis=1, how="all")
+            filtered_columns = TrajectoriesReprocessor.filter_target_columns(
+                df.columns, target_agents, target_columns_suffix
+            )
+            target_data = df[["Frame"] + filtered_columns]
+            record["rows_out"] = len(target_data)
         roles = {k: metadata["ROLE"] for k, metadata in traj_metadata.items()}
-        col_nans = "x"
-        if self.pp_type == "6D":
-            filtered_df = Filterer6DOF.reorganize_df(target_data, target_agents, roles)
+        return target_data, roles, target_agents
 
-        elif self.pp_type == "3D-best_marker":
-            filtered_df = Filterer3DOF.filter_best_markers(target_data, roles)
+    def filter_target_data(
+        self, target_data: pd.DataFrame, roles: dict, target_agents: Tuple[str]
+    ) -> pd.DataFrame:
+        with self.profiler.stage("filterer", rows_in=len(target_data)) as record:
+            if self.pp_type == "6D":
+                filtered_df = Filterer6DOF.reorganize_df(
+                    target_data, target_agents, roles
+                )
+
+            elif self.pp_type == "3D-best_marker":
+                filtered_df = Filterer3DOF.filter_best_markers(target_data, roles)
 
-        elif self.pp_type == "3D-restoration":
-            filtered_df = Filterer3DOF.restore_markers(target_data, roles)
+            elif self.pp_type == "3D-restoration":
+                filtered_df = Filterer3DOF.restore_markers(target_data, roles)
+            record["rows_out"] = len(filtered_df)
+        return filtered_df
 
+    def reprocess_filtered_data(
+        self, filtered_df: pd.DataFrame, target_agents: Tuple[str]
+    ) -> pd.DataFrame:
+        """interpolation, resampling and moving average of the filtered data,
+        stored in the output directory if any"""
+        file_name = self.csv_path.split("/")[-1]
+        col_nans = "x"
+        agents_nans = AgentsPartition(filtered_df).count_nans(col_nans)
         pre_nans_counter = {
-            body_name: filtered_df[filtered_df["ag_id"] == body_name][col_nans]
-            .isna()
-            .sum()
-            for body_name in target_agents
+            body_name: agents_nans.get(body_name, 0) for body_name in target_agents
         }
         LOGGER.debug("Pre running the preprocessing # NaNs: %s", pre_nans_counter)
 
         pp_df = TrajectoriesReprocessor.reprocessing(
             input_df=filtered_df,
             max_nans_interpolate=self.max_nans_interpolate,
+            profiler=self.profiler,
+            frame_rate=FRAME_RATE_HZ,
             resampling_rule=self.args["resampling_rule"],
             average_window=self.args["average_window"],
         )
+        agents_nans = AgentsPartition(pp_df).count_nans(col_nans)
         postprocessed_nans_counter = {
-            body_name: pp_df[pp_df["ag_id"] == body_name][col_nans].isna().sum()
-            for body_name in target_agents
+            body_name: agents_nans.get(body_name, 0) for body_name in target_agents
         }
         pp_df["frame_id"] = pp_df["frame_id"].astype("int")
         LOGGER.debug(
@@ -223,6 +446,25 @@ class TrajectoriesReprocessor:
         )
         LOGGER.info("%s preprocessed!", file_name)
         if self.out_dir:
-            create_dir(os.path.join(self.out_dir, scenario_id))
-            pp_df.to_csv(os.path.join(self.out_dir, scenario_id, file_name))
+            out_file_path = self.get_out_file_path()
+            create_dir(os.path.dirname(out_file_path))
+            with self.profiler.stage("dump", rows_in=len(pp_df)) as record:
+                dump_trajectories_file(pp_df, out_file_path, self.out_format)
+                record["rows_out"] = len(pp_df)
+        if self.profile:
+            LOGGER.debug("Profile of %s: %s", file_name, self.profiler.records)
+            if self.out_dir:
+                self.profiler.dump(
+                    self.get_profile_path(),
+                    csv_path=self.csv_path,
+                    out_file_path=out_file_path,
+                )
         return pp_df
+
+    def run(self):
+        self.profiler = StageProfiler(
+            enabled=self.profile, trace_memory=self.profile_memory
+        )
+        target_data, roles, target_agents = self.load_target_data()
+        filtered_df = self.filter_target_data(target_data, roles, target_agents)
+        return self.reprocess_filtered_data(filtered_df, target_agents)
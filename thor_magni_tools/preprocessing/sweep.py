@@ -0,0 +1,150 @@
+import os
+import logging
+from itertools import product
+from typing import Dict, List, Optional
+
+from .reprocess import TrajectoriesReprocessor
+from ..utils.cache import RawRecordingsCache
+from ..utils.profiling import StageProfiler
+from ..data_tests.logger import CustomFormatter
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(CustomFormatter())
+LOGGER.addHandler(ch)
+
+SWEEP_PARAMETERS = (
+    "preprocessing_type",
+    "max_nans_interpolate",
+    "resampling_rule",
+    "average_window",
+)
+
+
+class SweepReprocessor:
+    """Preprocessing of a raw file with all the combinations of a parameters grid.
+    The file is parsed once (columns of all the preprocessing types) and the
+    markers filtering is shared by the variants with the same preprocessing type.
+    Each variant is stored in `<out_path>/<variant name>/`.
+    """
+
+    def __init__(
+        self,
+        csv_path: str,
+        out_path: str,
+        sweep: Dict[str, list],
+        preprocessing_type: str,
+        max_nans_interpolate: int,
+        cache: Optional[RawRecordingsCache] = None,
+        float_dtype: Optional[str] = None,
+        out_format: str = "csv",
+        profile: bool = False,
+        profile_memory: bool = False,
+        **kwargs,
+    ) -> None:
+        self.csv_path = csv_path
+        self.variants = SweepReprocessor.get_variants(
+            dict(
+                preprocessing_type=preprocessing_type,
+                max_nans_interpolate=max_nans_interpolate,
+                **kwargs,
+            ),
+            sweep,
+        )
+        self.processors = [
+            TrajectoriesReprocessor(
+                csv_path=csv_path,
+                out_path=(
+                    os.path.join(out_path, SweepReprocessor.get_variant_name(variant))
+                    if out_path
+                    else out_path
+                ),
+                cache=cache,
+                float_dtype=float_dtype,
+                out_format=out_format,
+                profile=profile,
+                profile_memory=profile_memory,
+                **variant,
+            )
+            for variant in self.variants
+        ]
+
+    @staticmethod
+    def get_variants(base_parameters: dict, sweep: Dict[str, list]) -> List[dict]:
+        """all the combinations of the sweep values, the other parameters take the
+        base value"""
+        unknown_parameters = set(sweep) - set(SWEEP_PARAMETERS)
+        if unknown_parameters:
+            raise ValueError(
+                f"Sweep parameters {unknown_parameters} not supported. "
+                f"Options: {SWEEP_PARAMETERS}"
+            )
+        return [
+            dict(base_parameters, **dict(zip(sweep.keys(), values)))
+            for values in product(*sweep.values())
+        ]
+
+    @staticmethod
+    def get_variant_name(variant: dict) -> str:
+        return "__".join(f"{key}={variant[key]}" for key in SWEEP_PARAMETERS)
+
+    def get_out_file_path(self) -> str:
+        """output of the last variant of the last preprocessing type, i.e. the last
+        file written"""
+        last_type = list(dict.fromkeys(p.pp_type for p in self.processors))[-1]
+        return [
+            processor.get_out_file_path()
+            for processor in self.processors
+            if processor.pp_type == last_type
+        ][-1]
+
+    def get_profiles_paths(self) -> List[str]:
+        """the parsing is profiled with the first variant and the markers filtering
+        with the first variant of each preprocessing type"""
+        return [processor.get_profile_path() for processor in self.processors]
+
+    def get_config(self) -> dict:
+        return dict(
+            variants=[processor.get_config() for processor in self.processors]
+        )
+
+    def estimate_peak_memory(self) -> int:
+        """the variants run one after the other, sharing the parsed file"""
+        return max(processor.estimate_peak_memory() for processor in self.processors)
+
+    def run(self) -> dict:
+        """
+        Returns
+        -------
+            dict s.t. {variant name: preprocessed dataframe}
+        """
+        preprocessing_types = list(
+            dict.fromkeys(processor.pp_type for processor in self.processors)
+        )
+        for processor in self.processors:
+            processor.profiler = StageProfiler(
+                enabled=processor.profile, trace_memory=processor.profile_memory
+            )
+        target_data, roles, target_agents = self.processors[0].load_target_data(
+            preprocessing_types
+        )
+        pp_dfs = {}
+        for preprocessing_type in preprocessing_types:
+            variants_processors = [
+                (variant, processor)
+                for variant, processor in zip(self.variants, self.processors)
+                if processor.pp_type == preprocessing_type
+            ]
+            filtered_df = variants_processors[0][1].filter_target_data(
+                target_data, roles, target_agents
+            )
+            for variant, processor in variants_processors:
+                variant_name = SweepReprocessor.get_variant_name(variant)
+                LOGGER.debug("Running variant %s", variant_name)
+                pp_dfs[variant_name] = processor.reprocess_filtered_data(
+                    filtered_df, target_agents
+                )
+        return pp_dfs
@@ -1,10 +1,11 @@
 import os
 import logging
 from argparse import ArgumentParser
-import ray
 
 from .data_tests.logger import CustomFormatter
+from .io import TRAJECTORIES_FORMATS
 from .preprocessing import ActionsMerger
+from .utils.executor import Executor, EXECUTOR_BACKENDS
 
 
 LOGGER = logging.getLogger(__name__)
@@ -40,32 +41,56 @@ parser.add_argument(
     help="Data to store the merged files",
 )
 
+parser.add_argument(
+    "--out_format",
+    type=str,
+    required=False,
+    choices=TRAJECTORIES_FORMATS,
+    default="csv",
+    help="Merged files format",
+)
+
+parser.add_argument(
+    "--backend",
+    type=str,
+    required=False,
+    choices=EXECUTOR_BACKENDS,
+    default="process-pool",
+    help="Execution backend of the batch",
+)
+
+parser.add_argument(
+    "--n_workers",
+    type=int,
+    required=False,
+    default=None,
+    help="Number of workers of the batch",
+)
+
 
 args = parser.parse_args()
 files_path = args.files_dir
 run_batch = True
-if files_path.endswith(".csv"):
+if files_path.endswith(tuple(f".{ext}" for ext in TRAJECTORIES_FORMATS)):
     run_batch = False
 
 
 if run_batch:
-
-    @ray.remote
-    def ray_run_processor(processor):
-        return processor.run()
-
-    ray.init()
     mergers = [
         ActionsMerger(
             actions_path=args.actions_path,
             csv_path=os.path.join(files_path, file_name),
             out_dir=args.out_path,
+            out_format=args.out_format,
         )
         for file_name in os.listdir(files_path)
     ]
-    ray.get([ray_run_processor.remote(merger) for merger in mergers])
+    Executor(args.backend, args.n_workers).run(mergers, keep_results=False)
 else:
     merger = ActionsMerger(
-        actions_path=args.actions_path, csv_path=files_path, out_dir=args.out_path
+        actions_path=args.actions_path,
+        csv_path=files_path,
+        out_dir=args.out_path,
+        out_format=args.out_format,
     )
     merger.run()
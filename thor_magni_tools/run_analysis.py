@@ -1,11 +1,19 @@
+import os
 import logging
 from argparse import ArgumentParser
 
 
 from .data_tests.logger import CustomFormatter
+from .analysis.dataset_converters import convert_dataset
 from .analysis.global_analysis.dataset_analyzer import DatasetAnalyzer
 from .analysis.global_analysis.global_analyzer import GlobalAnalyzer
 from .analysis.utils import log_metrics
+from .data_tests.test_metrics import (
+    validate_stream_metrics,
+    validate_stream_carried_rows,
+)
+from .utils.cache import RawRecordingsCache
+from .utils.executor import Executor, EXECUTOR_BACKENDS
 
 
 LOGGER = logging.getLogger(__name__)
@@ -56,17 +64,87 @@ parser.add_argument(
     help="Filtering markers procedure.",
 )
 
+parser.add_argument(
+    "--chunksize",
+    type=int,
+    required=False,
+    default=None,
+    help="Stream ATC/SDD files in time-ordered chunks of this number of rows",
+)
+
+parser.add_argument(
+    "--cache_dir",
+    type=str,
+    required=False,
+    default=None,
+    help="Directory to cache the parsed raw recordings",
+)
+
+parser.add_argument(
+    "--cache_max_size_gb",
+    type=float,
+    required=False,
+    default=20.0,
+    help="Max size of the cache directory in GB",
+)
+
+parser.add_argument(
+    "--backend",
+    type=str,
+    required=False,
+    choices=EXECUTOR_BACKENDS,
+    default="serial",
+    help="Execution backend to analyze the files of a folder",
+)
+
+parser.add_argument(
+    "--n_workers",
+    type=int,
+    required=False,
+    default=None,
+    help="Number of workers to analyze the files of a folder",
+)
+
+parser.add_argument(
+    "--close_encounters_threshold",
+    type=float,
+    required=False,
+    default=None,
+    help="Single file: store the intervals during which pairs of humans are closer "
+    "than this distance in outputs/analysis/<dataset>/<file>_close_encounters.csv",
+)
+
+parser.add_argument(
+    "--close_encounters_max_gap",
+    type=int,
+    required=False,
+    default=0,
+    help="Max frames without closeness within a close encounter",
+)
+
+parser.add_argument(
+    "--check_stream",
+    action="store_true",
+    help="Single file with --chunksize: also load the whole file and check that the "
+    "streamed metrics match, and that the rows carried over between chunks stay "
+    "bounded",
+)
+
 args = parser.parse_args()
 data_path = args.data_path
 dataset_name = args.dataset_name
 
 run_batch = True
-if args.data_path.endswith((".csv", ".tsv", ".txt")):
+if args.data_path.endswith((".csv", ".tsv", ".txt", ".parquet", ".npz")):
     run_batch = False
 
 extra_args = None
 if dataset_name:
     extra_args = dict(filtering_markers=args.filtering_markers)
+    if args.cache_dir:
+        extra_args.update(
+            cache=RawRecordingsCache(args.cache_dir, args.cache_max_size_gb)
+        )
 
 if run_batch:
     global_analyzer = GlobalAnalyzer(
@@ -77,6 +155,8 @@ if run_batch:
         min_social_distance=True,
         benchmark_metrics=True,
         save_path="outputs/analysis",
+        chunksize=args.chunksize,
+        executor=Executor(args.backend, args.n_workers),
     )
     global_metrics = global_analyzer.run(data_path, **extra_args)
     LOGGER.debug("===Logging Global Metrics===")
@@ -90,7 +170,36 @@ else:
         tracking_duration=True,
         min_social_distance=True,
         benchmark_metrics=True,
+        chunksize=args.chunksize,
     )
-    metrics = dataset_analyzer.run(data_path, **extra_args)
+    # without --chunksize the file is converted once for the metrics and the close
+    # encounters
+    dynamic_agents = None
+    if not args.chunksize:
+        dynamic_agents = convert_dataset(dataset_name, data_path, **extra_args)
+    metrics = dataset_analyzer.run(data_path, dynamic_agents, **extra_args)
     LOGGER.debug("Metrics for %s:", data_path.split("/")[-1])
     log_metrics(LOGGER, metrics)
+    if args.check_stream and args.chunksize:
+        dataset_analyzer.chunksize = None
+        validate_stream_metrics(metrics, dataset_analyzer.run(data_path, **extra_args))
+        validate_stream_carried_rows(
+            dataset_analyzer.agents_stream.max_carried_rows,
+            len(dataset_analyzer.agents_stream.agents_metrics),
+            dataset_analyzer.agents_stream.tracklet_len,
+        )
+        dataset_analyzer.chunksize = args.chunksize
+    if args.close_encounters_threshold:
+        dataset_analyzer.dump_close_encounters(
+            data_path,
+            args.close_encounters_threshold,
+            os.path.join(
+                "outputs/analysis",
+                dataset_name,
+                os.path.splitext(os.path.basename(data_path))[0]
+                + "_close_encounters.csv",
+            ),
+            max_gap_frames=args.close_encounters_max_gap,
+            dynamic_agents=dynamic_agents,
+            **extra_args,
+        )
@@ -0,0 +1,96 @@
+import os
+import logging
+from argparse import ArgumentParser
+import pandas as pd
+
+from .data_tests.logger import CustomFormatter
+from .io import create_dir
+from .preprocessing.online import OnlineTrajectoriesReprocessor, replay_recording
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(CustomFormatter())
+LOGGER.addHandler(ch)
+
+
+parser = ArgumentParser(description="Online Trajectory Data Preprocessor (replay)")
+
+parser.add_argument(
+    "--csv_path",
+    type=str,
+    required=True,
+    help="Path to the THOR-Magni recording to replay",
+)
+
+parser.add_argument(
+    "--preprocessing_type",
+    type=str,
+    required=False,
+    choices=OnlineTrajectoriesReprocessor.PREPROCESSING_TYPES,
+    default="3D-best_marker",
+    help="Filtering of the markers",
+)
+
+parser.add_argument(
+    "--max_nans_interpolate",
+    type=int,
+    required=False,
+    default=100,
+    help="Max frames without tracking to interpolate, i.e. max latency in frames",
+)
+
+parser.add_argument(
+    "--average_window",
+    type=str,
+    required=False,
+    default=None,
+    help="Moving average window, e.g. 800ms",
+)
+
+parser.add_argument(
+    "--batch_size",
+    type=int,
+    required=False,
+    default=1,
+    help="Number of frames pushed at a time",
+)
+
+parser.add_argument(
+    "--speed",
+    type=float,
+    required=False,
+    default=1.0,
+    help="Replay speed wrt real time, 0 to replay as fast as possible",
+)
+
+parser.add_argument(
+    "--out_path",
+    type=str,
+    required=False,
+    default=None,
+    help="Optional path to the csv file storing the emitted rows",
+)
+
+args = parser.parse_args()
+emitted_rows = []
+for rows in replay_recording(
+    args.csv_path,
+    preprocessing_type=args.preprocessing_type,
+    max_nans_interpolate=args.max_nans_interpolate,
+    average_window=args.average_window,
+    batch_size=args.batch_size,
+    speed=args.speed,
+):
+    if len(rows) > 0:
+        LOGGER.debug(
+            "Emitted frames %s-%s", rows["frame_id"].iloc[0], rows["frame_id"].iloc[-1]
+        )
+    if args.out_path:
+        emitted_rows.append(rows)
+LOGGER.info("%s replayed!", os.path.basename(args.csv_path))
+if args.out_path:
+    create_dir(os.path.dirname(args.out_path) or ".")
+    pd.concat(emitted_rows).to_csv(args.out_path)
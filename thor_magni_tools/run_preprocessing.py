@@ -1,11 +1,18 @@
 import os
 import logging
+import cProfile
 from argparse import ArgumentParser
-import ray
 
 from .data_tests.logger import CustomFormatter
-from .io import load_yaml_file
-from .preprocessing import TrajectoriesReprocessor
+from .io import create_dir, load_yaml_file, TRAJECTORIES_FORMATS
+from .preprocessing import (
+    TrajectoriesReprocessor,
+    PreprocessingManifest,
+    SweepReprocessor,
+)
+from .utils.cache import RawRecordingsCache
+from .utils.executor import Executor, EXECUTOR_BACKENDS
+from .utils.profiling import aggregate_profiles
 
 
 LOGGER = logging.getLogger(__name__)
@@ -26,38 +33,168 @@ parser.add_argument(
     help="Path to the config file",
 )
 
+parser.add_argument(
+    "--out_format",
+    type=str,
+    required=False,
+    choices=TRAJECTORIES_FORMATS,
+    default=None,
+    help="Output files format, overrides the one in the config file",
+)
+
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only preprocess the files whose raw data, config or output changed since "
+    "the last incremental run (tracked in <out_path>/manifest.json)",
+)
+
+parser.add_argument(
+    "--backend",
+    type=str,
+    required=False,
+    choices=EXECUTOR_BACKENDS,
+    default=None,
+    help="Execution backend of the batch, overrides the one in the config file",
+)
+
+parser.add_argument(
+    "--n_workers",
+    type=int,
+    required=False,
+    default=None,
+    help="Number of workers of the batch, overrides the one in the config file",
+)
+
+parser.add_argument(
+    "--memory_budget_gb",
+    type=float,
+    required=False,
+    default=None,
+    help="Max estimated memory of the files preprocessed at the same time, "
+    "overrides the one in the config file",
+)
+
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Record wall time and rows in/out of each stage of each file "
+    "(<output file>.profile.json), aggregated in <out_path>/profile.csv",
+)
+
+parser.add_argument(
+    "--profile_memory",
+    action="store_true",
+    help="With --profile, also trace the peak memory of each stage (tracemalloc), "
+    "which slows the stages down 2-5x",
+)
+
+parser.add_argument(
+    "--cprofile",
+    action="store_true",
+    help="With --profile, rerun the slowest file under cProfile, without writing "
+    "outputs, and dump the stats to <out_path>/slowest_file.prof",
+)
+
 args = parser.parse_args()
 cfg = load_yaml_file(args.cfg_file)
+out_format = args.out_format or cfg.get("out_format", "csv")
+executor = Executor(
+    backend=args.backend or cfg.get("backend", "process-pool"),
+    n_workers=args.n_workers or cfg.get("n_workers"),
+    memory_budget_gb=args.memory_budget_gb or cfg.get("memory_budget_gb"),
+)
+cache = (
+    RawRecordingsCache(cfg["cache_dir"], cfg.get("cache_max_size_gb", 20.0))
+    if cfg.get("cache_dir")
+    else None
+)
 run_batch = True
 if cfg["in_path"].endswith(".csv"):
     run_batch = False
 
-if run_batch:
-    @ray.remote
-    def ray_run_processor(processor):
-        return processor.run()
-
-    ray.init()
-    processors = [
-        TrajectoriesReprocessor(
-            csv_path=os.path.join(cfg["in_path"], file_name),
-            out_path=cfg["out_path"],
-            preprocessing_type=cfg["preprocessing_type"],
-            max_nans_interpolate=cfg["max_nans_interpolate"],
-            **cfg["options"]
-        )
+csv_paths = (
+    [
+        os.path.join(cfg["in_path"], file_name)
         for file_name in os.listdir(cfg["in_path"])
     ]
-    ray.get(
-            [ray_run_processor.remote(processor) for processor in processors]
+    if run_batch
+    else [cfg["in_path"]]
+)
+# sweep mode: one parse per file shared by all the variants of the grid
+sweep_args = dict(sweep=cfg["sweep"]) if cfg.get("sweep") else {}
+processor_class = SweepReprocessor if sweep_args else TrajectoriesReprocessor
+processor_args = dict(
+    preprocessing_type=cfg["preprocessing_type"],
+    max_nans_interpolate=cfg["max_nans_interpolate"],
+    cache=cache,
+    float_dtype=cfg.get("float_dtype"),
+    out_format=out_format,
+    **sweep_args,
+    **cfg["options"]
+)
+processors = [
+    processor_class(
+        csv_path=csv_path,
+        out_path=cfg["out_path"],
+        profile=args.profile,
+        profile_memory=args.profile_memory,
+        **processor_args
+    )
+    for csv_path in csv_paths
+]
+
+if args.incremental:
+    if not cfg["out_path"]:
+        raise ValueError("Incremental preprocessing requires an out_path")
+    manifest = PreprocessingManifest(os.path.join(cfg["out_path"], "manifest.json"))
+    config_hash = PreprocessingManifest.get_config_hash(processors[0].get_config())
+    skipped = [
+        processor
+        for processor in processors
+        if manifest.is_up_to_date(
+            processor.csv_path, config_hash, processor.get_out_file_path()
         )
+    ]
+    processors = [processor for processor in processors if processor not in skipped]
+    LOGGER.info(
+        "Skipping %d unchanged files: %s",
+        len(skipped),
+        [os.path.basename(processor.csv_path) for processor in skipped],
+    )
 
-else:
-    preprocessor = TrajectoriesReprocessor(
-        csv_path=cfg["in_path"],
-        out_path=cfg["out_path"],
-        preprocessing_type=cfg["preprocessing_type"],
-        max_nans_interpolate=cfg["max_nans_interpolate"],
-        **cfg["options"]
+if run_batch:
+    executor.run(
+        processors,
+        keep_results=False,
+        memory_estimates=[processor.estimate_peak_memory() for processor in processors],
+    )
+elif processors:
+    processors[0].run()
+
+if args.incremental:
+    for processor in processors:
+        manifest.update(processor.csv_path, config_hash, processor.get_out_file_path())
+    create_dir(cfg["out_path"])
+    manifest.dump()
+    LOGGER.info("%d files preprocessed, manifest updated", len(processors))
+
+if args.profile and cfg["out_path"] and processors:
+    profile_df = aggregate_profiles(
+        [path for processor in processors for path in processor.get_profiles_paths()],
+        cfg["out_path"],
     )
-    preprocessor.run()
+    if args.cprofile and len(profile_df) > 0:
+        slowest_csv_path = (
+            profile_df.groupby("csv_path")["wall_time_s"].sum().idxmax()
+        )
+        LOGGER.info("Profiling %s with cProfile", slowest_csv_path)
+        # without outputs nor stage profiling: the files of the batch stay untouched
+        slowest_processor = processor_class(
+            csv_path=slowest_csv_path, out_path=None, **processor_args
+        )
+        cprofile_path = os.path.join(cfg["out_path"], "slowest_file.prof")
+        stats_profiler = cProfile.Profile()
+        stats_profiler.runcall(slowest_processor.run)
+        stats_profiler.dump_stats(cprofile_path)
+        LOGGER.info("cProfile stats stored in %s", cprofile_path)
@@ -6,6 +6,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import cv2
 
+from thor_magni_tools.io import load_trajectories_file
+
 
 def extract_target_columns(
     input_df: pd.DataFrame, target_cols_init=Tuple[str]
@@ -21,7 +23,7 @@ class Loader:
 
     @staticmethod
     def load_raw_csv(path: str) -> pd.DataFrame:
-        return pd.read_csv(path, index_col="Time")
+        return load_trajectories_file(path, index_col="Time")
 
     @staticmethod
     def get_eyt_helmets(
@@ -5,6 +5,7 @@ import pandas as pd
 
 from thor_magni_tools.data_tests.logger import CustomFormatter
 from thor_magni_tools.preprocessing import TrajectoriesReprocessor
+from thor_magni_tools.utils.cache import RawRecordingsCache
 from .utils import Loader, visualize_trajectories
 
 
@@ -43,6 +44,14 @@ parser.add_argument(
     help="Number of frame leaps on the visualization",
 )
 
+parser.add_argument(
+    "--cache_dir",
+    type=str,
+    required=False,
+    default=None,
+    help="Directory to cache the parsed raw recordings",
+)
+
 
 args = parser.parse_args()
 if not args.raw_file.endswith(".csv"):
@@ -56,6 +65,7 @@ preprocessor = TrajectoriesReprocessor(
         out_path=None,
         preprocessing_type="6D",
         max_nans_interpolate=100,
+        cache=RawRecordingsCache(args.cache_dir) if args.cache_dir else None,
         **preprocessing_type_options
     )
 raw_df = preprocessor.run()
@@ -0,0 +1,138 @@
+import os
+import glob
+import hashlib
+import logging
+from typing import Callable, Optional, Tuple
+import pandas as pd
+
+from ..io import (
+    create_dir,
+    dump_json_file,
+    dump_npz_dataframe,
+    load_json_file,
+    load_npz_dataframe,
+)
+from ..data_tests.logger import CustomFormatter
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(CustomFormatter())
+LOGGER.addHandler(ch)
+
+HASH_CHUNK_SIZE = 1 << 20
+HASHES_INDEX = "content_hashes.json"
+
+
+class RawRecordingsCache:
+    """On-disk cache of parsed raw recordings (DataFrame + header dictionary).
+
+    Entries are npz files keyed by the file path, the content hash of the raw file
+    (memoized while its size and modification time do not change) and the loader
+    kwargs. Entries of a previous content of a file are removed on
+    the next miss, and least recently used entries are evicted once the cache grows
+    beyond `max_size_gb`.
+    """
+
+    def __init__(self, cache_dir: str, max_size_gb: float = 20.0) -> None:
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_gb * (1 << 30))
+
+    @staticmethod
+    def get_content_hash(path: str) -> str:
+        file_hash = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def get_file_hash(self, abs_path: str) -> str:
+        """content hash of the raw file, only recomputed if its size or modification
+        time changed since it was stored in the hashes index of the cache:
+        {raw file path: {size, mtime_ns, content_hash}}"""
+        index_path = os.path.join(self.cache_dir, HASHES_INDEX)
+        hashes = load_json_file(index_path) if os.path.exists(index_path) else {}
+        stat = os.stat(abs_path)
+        entry = hashes.get(abs_path)
+        if entry and (entry["size"], entry["mtime_ns"]) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            return entry["content_hash"]
+        content_hash = RawRecordingsCache.get_content_hash(abs_path)
+        hashes[abs_path] = dict(
+            size=stat.st_size, mtime_ns=stat.st_mtime_ns, content_hash=content_hash
+        )
+        # atomic write, workers may update the index concurrently
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        dump_json_file(hashes, tmp_path)
+        os.replace(tmp_path, index_path)
+        return content_hash
+
+    def get_entry_path(self, path: str, **loader_kwargs) -> str:
+        """entry file name: <path digest>-<content digest>-<loader kwargs digest>.npz,
+        i.e. the loads of a recording with other kwargs (e.g. `usecols` projections)
+        are distinct entries of the same content"""
+        abs_path = os.path.abspath(path)
+        kwargs_key = "|".join(f"{k}={v}" for k, v in sorted(loader_kwargs.items()))
+        path_digest = hashlib.sha1(abs_path.encode()).hexdigest()[:16]
+        content_digest = self.get_file_hash(abs_path)[:16]
+        kwargs_digest = hashlib.sha1(kwargs_key.encode()).hexdigest()[:16]
+        return os.path.join(
+            self.cache_dir, f"{path_digest}-{content_digest}-{kwargs_digest}.npz"
+        )
+
+    def evict(self, keep_path: Optional[str] = None) -> None:
+        """remove least recently used entries until the cache fits its budget"""
+        entries = [
+            (os.path.getmtime(entry), os.path.getsize(entry), entry)
+            for entry in glob.glob(os.path.join(self.cache_dir, "*.npz"))
+        ]
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if cache_size <= self.max_size_bytes:
+                break
+            if entry == keep_path:
+                continue
+            os.remove(entry)
+            cache_size -= size
+            LOGGER.debug("Evicted %s from the cache", entry)
+
+    def load(
+        self,
+        path: str,
+        loader: Callable[..., Tuple[pd.DataFrame, dict]],
+        **loader_kwargs,
+    ) -> Tuple[pd.DataFrame, dict]:
+        """load the parsed recording from the cache or parse it with `loader` and
+        store the result
+
+        Parameters
+        ----------
+        path
+            path to the raw file
+        loader
+            function returning (raw_df, header_dict) given the path
+
+        Returns
+        -------
+            Panda DataFrame and Dictionary with the metadata
+        """
+        create_dir(self.cache_dir)
+        entry_path = self.get_entry_path(path, **loader_kwargs)
+        if os.path.exists(entry_path):
+            os.utime(entry_path)
+            LOGGER.debug("Cache hit for %s", path)
+            return load_npz_dataframe(entry_path)
+
+        raw_df, header_dict = loader(path, **loader_kwargs)
+        # entries of a previous content of the file, whatever their loader kwargs
+        path_digest, content_digest, _ = os.path.basename(entry_path).split("-")
+        for entry in glob.glob(os.path.join(self.cache_dir, f"{path_digest}-*.npz")):
+            if os.path.basename(entry).split("-")[1] != content_digest:
+                os.remove(entry)
+        dump_npz_dataframe(raw_df, entry_path, metadata=header_dict)
+        self.evict(keep_path=entry_path)
+        return raw_df, header_dict
@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+MARKER_COLUMN_PATTERN = re.compile(r"((.*?) - (\d+)) (X|Y|Z)$")
+AXES = ("X", "Y", "Z")
+
+
+class ColumnsLayout:
+    """Index of the raw recording columns, parsed once:
+    body -> marker -> axis -> column position
+
+    `Frame` is not a body. Marker columns follow the `<body> - <marker> <axis>`
+    convention, e.g. "Helmet_2 - 1 X".
+    """
+
+    def __init__(self, columns: Tuple[str]) -> None:
+        self.columns = columns
+        self.bodies: Dict[str, List[int]] = {}
+        self.markers: Dict[str, Dict[str, Dict[str, int]]] = {}
+        for position, col in enumerate(columns):
+            if col == "Frame":
+                continue
+            self.bodies.setdefault(col.split(" ")[0], []).append(position)
+            match = MARKER_COLUMN_PATTERN.match(col)
+            if match:
+                body_markers = self.markers.setdefault(match.group(2), {})
+                body_markers.setdefault(match.group(3), {})[match.group(4)] = position
+
+    @property
+    def instances(self) -> List[str]:
+        """bodies with markers (body names without spaces)"""
+        return [body for body in self.markers if len(body.split(" ")) == 1]
+
+    def get_marker_columns(self, body: str, marker_id: str) -> List[str]:
+        """marker columns sorted by their position in the file"""
+        positions = sorted(self.markers[body][marker_id].values())
+        return [self.columns[position] for position in positions]
+
+    def get_markers_positions(self, bodies: List[str]) -> np.ndarray:
+        """(bodies, markers, axes) array of column positions, padded with -1 for
+        bodies with less markers and missing axes"""
+        n_markers = max((len(self.markers[body]) for body in bodies), default=0)
+        positions = np.full((len(bodies), n_markers, len(AXES)), -1, dtype=np.int64)
+        for i, body in enumerate(bodies):
+            for j, axes in enumerate(self.markers[body].values()):
+                for k, axis in enumerate(AXES):
+                    positions[i, j, k] = axes.get(axis, -1)
+        return positions
+
+    def count_markers_nans(self, input_df: pd.DataFrame, axis: str = "X") -> dict:
+        """number of NaN values per marker of each instance, computed over all the
+        `axis` columns at once
+
+        Returns
+        -------
+            dict s.t. {instance_id: {marker_id: n_nans}}
+        """
+        keys, positions = [], []
+        for instance_id in self.instances:
+            for marker_id, axes in self.markers[instance_id].items():
+                if axis in axes:
+                    keys.append((instance_id, marker_id))
+                    positions.append(axes[axis])
+        n_nans = input_df.iloc[:, positions].isna().to_numpy().sum(axis=0)
+        nan_counter_by_marker = {}
+        for (instance_id, marker_id), marker_nans in zip(keys, n_nans):
+            nan_counter_by_marker.setdefault(instance_id, {})[marker_id] = marker_nans
+        return nan_counter_by_marker
+
+
+@lru_cache(maxsize=64)
+def _get_columns_layout(columns: Tuple[str]) -> ColumnsLayout:
+    return ColumnsLayout(columns)
+
+
+def get_columns_layout(columns: Sequence[str]) -> ColumnsLayout:
+    """cached ColumnsLayout, i.e. built once for each set of columns"""
+    return _get_columns_layout(tuple(columns))
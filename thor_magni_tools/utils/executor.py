@@ -0,0 +1,150 @@
+import logging
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from ..data_tests.logger import CustomFormatter
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(CustomFormatter())
+LOGGER.addHandler(ch)
+
+EXECUTOR_BACKENDS = ("serial", "process-pool", "thread-pool", "ray")
+
+
+def run_task(task) -> Any:
+    return task.run()
+
+
+def run_task_without_result(task) -> None:
+    task.run()
+
+
+class Executor:
+    """Runs independent tasks with a serial, process pool, thread pool or ray
+    backend. Results are returned in the order of the inputs.
+    Ray is only imported (and initialized) when selected.
+
+    Given per task memory estimates, tasks are submitted from the largest to the
+    smallest and the sum of the estimates of the in-flight tasks is kept under
+    `memory_budget_gb` (a task larger than the budget runs alone).
+    """
+
+    def __init__(
+        self,
+        backend: str = "serial",
+        n_workers: Optional[int] = None,
+        memory_budget_gb: Optional[float] = None,
+    ) -> None:
+        if backend not in EXECUTOR_BACKENDS:
+            raise ValueError(
+                f"Backend {backend} not supported. Options: {EXECUTOR_BACKENDS}"
+            )
+        self.backend = backend
+        self.n_workers = n_workers
+        self.memory_budget = (
+            int(memory_budget_gb * (1 << 30)) if memory_budget_gb else None
+        )
+
+    def map(
+        self,
+        function: Callable,
+        items: Iterable,
+        memory_estimates: Optional[Sequence[int]] = None,
+    ) -> List[Any]:
+        """[function(item) for item in items], `function` and `items` must be
+        picklable for the process-pool and ray backends
+
+        Parameters
+        ----------
+        memory_estimates
+            optional estimated peak memory (bytes) of each task
+        """
+        items = list(items)
+        LOGGER.debug("Running %d tasks with the %s backend", len(items), self.backend)
+        if self.backend == "serial" or len(items) == 0:
+            return [function(item) for item in items]
+        if self.backend in ("thread-pool", "process-pool"):
+            pool_class = (
+                ThreadPoolExecutor
+                if self.backend == "thread-pool"
+                else ProcessPoolExecutor
+            )
+            with pool_class(max_workers=self.n_workers) as pool:
+                return self.bounded_map(
+                    lambda item: pool.submit(function, item),
+                    lambda futures: wait(futures, return_when=FIRST_COMPLETED)[0],
+                    lambda future: future.result(),
+                    items,
+                    memory_estimates,
+                )
+        import ray
+
+        ray.init(num_cpus=self.n_workers, ignore_reinit_error=True)
+        remote_function = ray.remote(function)
+        return self.bounded_map(
+            remote_function.remote,
+            lambda object_refs: ray.wait(list(object_refs), num_returns=1)[0],
+            ray.get,
+            items,
+            memory_estimates,
+        )
+
+    def bounded_map(
+        self,
+        submit: Callable,
+        wait_any: Callable,
+        get_result: Callable,
+        items: List[Any],
+        memory_estimates: Optional[Sequence[int]],
+    ) -> List[Any]:
+        """submit the tasks (largest first) while their memory fits the budget"""
+        if memory_estimates is None:
+            memory_estimates = [0] * len(items)
+        order = sorted(range(len(items)), key=lambda i: -memory_estimates[i])
+        results, pending, in_flight_memory = [None] * len(items), {}, 0
+
+        def collect(handles):
+            nonlocal in_flight_memory
+            for handle in handles:
+                i = pending.pop(handle)
+                results[i] = get_result(handle)
+                in_flight_memory -= memory_estimates[i]
+
+        for i in order:
+            while (
+                pending
+                and self.memory_budget is not None
+                and in_flight_memory + memory_estimates[i] > self.memory_budget
+            ):
+                collect(wait_any(pending.keys()))
+            pending[submit(items[i])] = i
+            in_flight_memory += memory_estimates[i]
+            LOGGER.debug(
+                "Task %d submitted, in-flight memory estimate: %1.3f GB",
+                i,
+                in_flight_memory / (1 << 30),
+            )
+        while pending:
+            collect(wait_any(pending.keys()))
+        return results
+
+    def run(
+        self,
+        tasks: Iterable,
+        keep_results: bool = True,
+        memory_estimates: Optional[Sequence[int]] = None,
+    ) -> Optional[List[Any]]:
+        """call `run()` of each task, e.g. TrajectoriesReprocessor objects. The
+        results are not sent back from the workers if `keep_results` is False"""
+        if keep_results:
+            return self.map(run_task, tasks, memory_estimates)
+        self.map(run_task_without_result, tasks, memory_estimates)
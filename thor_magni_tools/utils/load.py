@@ -1,10 +1,14 @@
+import os
 import ast
 import csv
-from typing import Tuple
+from typing import Iterable, List, Optional, Sequence, Tuple
 import json
 
+import numpy as np
 import pandas as pd
 
+from .cache import RawRecordingsCache
+
 
 def preprocessing_header_magni(header_dict: dict) -> dict:
     """return header in a more readable manner"""
@@ -71,10 +75,84 @@ def preprocessing_header_magni(header_dict: dict) -> dict:
     return new_header_dict
 
 
+def parse_header_rows(header_rows: Iterable[str]) -> dict:
+    """Parse the THOR-Magni header rows into {key: [values]}"""
+    header_dict = {}
+    for row in csv.reader(header_rows):
+        key = row[0]
+        values = row[1:]
+        values = filter(lambda x: x != "", values)
+        values = [int(v) if v.isnumeric() else v for v in values]
+        header_dict[key] = values
+    return header_dict
+
+
+def drop_duplicated_frames(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """Drop repeated frames keeping the first occurrence. When `Frame` is sorted,
+    duplicates are adjacent and a comparison with the previous row is enough"""
+    frames = raw_df["Frame"].values
+    if not raw_df["Frame"].is_monotonic_increasing:
+        return raw_df.drop_duplicates("Frame")
+    keep_mask = np.ones(len(frames), dtype=bool)
+    keep_mask[1:] = frames[1:] != frames[:-1]
+    if keep_mask.all():
+        return raw_df
+    return raw_df[keep_mask]
+
+
+def load_header_magni(path: str, header_size: int = 16) -> Tuple[dict, List[str]]:
+    """Read only the THOR-Magni header and the columns row, without parsing the
+    body of the file
+
+    Returns
+    -------
+        Dictionary with the metadata and list of column names
+    """
+    with open(path, "r", newline="\n") as csvfile:
+        header_rows = [csvfile.readline() for _ in range(header_size)]
+        columns = next(csv.reader([csvfile.readline()]))
+    return parse_header_rows(header_rows), columns
+
+
+def read_last_line(path: str, block_size: int = 1 << 12) -> str:
+    """Read the last non-empty line of a file seeking from its end"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            tail = f.read(read_size) + tail
+            lines = tail.rstrip(b"\r\n").split(b"\n")
+            if len(lines) > 1 or position == 0:
+                return lines[-1].rstrip(b"\r").decode()
+    return ""
+
+
+def inspect_csv_magni(path: str, header_size: int = 16) -> Tuple[dict, List[str], int]:
+    """Inspect a THOR-Magni file without parsing its body: it reads the header,
+    the columns row and the last row of the file
+
+    Returns
+    -------
+        Dictionary with the metadata, list of column names and last frame number
+    """
+    header_dict, columns = load_header_magni(path, header_size)
+    last_row = next(csv.reader([read_last_line(path)]))
+    return header_dict, columns, int(float(last_row[0]))
+
+
 def load_csv_metadata_magni(
-    path: str, header_size: int = 16
+    path: str,
+    header_size: int = 16,
+    cache: Optional[RawRecordingsCache] = None,
+    usecols: Optional[Sequence[str]] = None,
+    float_dtype: Optional[str] = None,
 ) -> Tuple[pd.DataFrame, dict]:
-    """Load THOR-Magni data
+    """Load THOR-Magni data. The header and the body are read from the same file
+    handle, i.e. the file is only opened and scanned once
 
     Parameters
     ----------
@@ -82,33 +160,51 @@ def load_csv_metadata_magni(
         Path to the csv file
     header_size
         Number of rows for the header
+    cache
+        Optional cache of parsed recordings, skips the csv parsing on hits
+    usecols
+        Optional subset of columns to parse. `Frame` and `Time` are always parsed
+    float_dtype
+        Optional dtype of the parsed `usecols`, e.g. "float32"
 
     Returns
     -------
         Panda DataFrame and Dictionary with the metadata
     """
-    raw_df = pd.read_csv(
-        path,
-        sep=",",
-        header=header_size,
-        index_col=1,
-    )
-    raw_df = raw_df.drop_duplicates(
-        "Frame"
-    )  # TODO: remove when solved issue with dupl.frames
-    header_dict = {}
+    if cache is not None:
+        return cache.load(
+            path,
+            load_csv_metadata_magni,
+            header_size=header_size,
+            usecols=usecols,
+            float_dtype=float_dtype,
+        )
     with open(path, "r", newline="\n") as csvfile:
-        csvreader = csv.reader(csvfile)
-
-        # Read the first 16 rows and store them in the list
-        for i, row in enumerate(csvreader):
-            if i > header_size - 1:
-                break
-            key = row[0]
-            values = row[1:]
-            values = filter(lambda x: x != "", values)
-            values = [int(v) if v.isnumeric() else v for v in values]
-            header_dict[key] = values
+        header_rows = [csvfile.readline() for _ in range(header_size)]
+        header_dict = parse_header_rows(header_rows)
+        if usecols is None:
+            raw_df = pd.read_csv(
+                csvfile,
+                sep=",",
+                header=0,
+                index_col=1,
+            )
+        else:
+            columns = next(csv.reader([csvfile.readline()]))
+            frame_col, time_col = columns[:2]
+            target_cols = [col for col in usecols if col not in (frame_col, time_col)]
+            raw_df = pd.read_csv(
+                csvfile,
+                sep=",",
+                header=None,
+                names=columns,
+                usecols=[frame_col, time_col] + target_cols,
+                index_col=time_col,
+                dtype={col: float_dtype for col in target_cols} if float_dtype else None,
+            )
+    raw_df = drop_duplicated_frames(
+        raw_df
+    )  # TODO: remove when solved issue with dupl.frames
     return raw_df, header_dict
 
 
@@ -0,0 +1,50 @@
+from typing import Hashable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+
+
+class AgentsPartition:
+    """Rows of a long format DataFrame grouped by agent.
+
+    The DataFrame is sorted by `agent_col` once (stable, i.e. rows keep their order
+    within each agent) and the rows of the i-th agent are
+    `sorted_df.iloc[offsets[i]:offsets[i + 1]]`, a slice without copies. Agents are
+    kept in order of first appearance, as `Series.unique()`.
+    """
+
+    def __init__(self, input_df: pd.DataFrame, agent_col: str = "ag_id") -> None:
+        codes, agents = pd.factorize(input_df[agent_col])
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        if np.all(self.order == np.arange(len(self.order))):
+            self.sorted_df = input_df
+        else:
+            self.sorted_df = input_df.iloc[self.order]
+        # rows without agent (NaN codes = -1) are sorted first and left out
+        self.offsets = np.searchsorted(sorted_codes, np.arange(len(agents) + 1))
+        self.agents = list(agents)
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def __iter__(self) -> Iterator[Tuple[Hashable, pd.DataFrame]]:
+        for i, agent_id in enumerate(self.agents):
+            yield agent_id, self.sorted_df.iloc[self.offsets[i]: self.offsets[i + 1]]
+
+    @property
+    def starts(self) -> np.ndarray:
+        """position of the first row of each agent in `sorted_df`"""
+        return self.offsets[:-1]
+
+    def count_nans(self, column: str) -> dict:
+        """number of NaN values of `column` per agent
+
+        Returns
+        -------
+            dict s.t. {agent_id: n_nans}
+        """
+        nans_cumsum = np.concatenate(
+            [[0], np.cumsum(self.sorted_df[column].isna().to_numpy())]
+        )
+        n_nans = nans_cumsum[self.offsets[1:]] - nans_cumsum[self.offsets[:-1]]
+        return dict(zip(self.agents, n_nans))
@@ -0,0 +1,59 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from ..data_tests.logger import CustomFormatter
+
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(CustomFormatter())
+LOGGER.addHandler(ch)
+
+CATEGORICAL_COLUMNS = ("ag_id", "agent_type")
+FLOAT32_COLUMNS_PREFIX = ("x", "y", "z", "rot")
+INT32_COLUMNS = ("frame_id",)
+
+
+def apply_trajectories_schema(input_df: pd.DataFrame) -> pd.DataFrame:
+    """Compact dtypes shared by all the converters and filterers outputs:
+    categorical agents ids and types, float32 positions/rotations and int32 frames
+
+    Parameters
+    ----------
+    input_df
+        long format trajectories |Time|frame_id|ag_id|x|y|z|agent_type|...
+
+    Returns
+    -------
+        pandas DataFrame with compact dtypes
+    """
+    target_dtypes = {}
+    for col in input_df.columns:
+        dtype = input_df[col].dtype
+        if col in CATEGORICAL_COLUMNS and not isinstance(dtype, pd.CategoricalDtype):
+            target_dtypes[col] = "category"
+        elif col in INT32_COLUMNS and dtype.kind in "iu" and dtype != np.int32:
+            target_dtypes[col] = np.int32
+        elif (
+            str(col).startswith(FLOAT32_COLUMNS_PREFIX)
+            and dtype.kind == "f"
+            and dtype != np.float32
+        ):
+            target_dtypes[col] = np.float32
+    if not target_dtypes:
+        return input_df
+    out_df = input_df.astype(target_dtypes)
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        # deep sizes, the strings of object columns are what the categories save
+        in_bytes = input_df.memory_usage(deep=True).sum()
+        out_bytes = out_df.memory_usage(deep=True).sum()
+        LOGGER.debug(
+            "Compact schema: %1.2f MB -> %1.2f MB (%1.2f MB saved)",
+            in_bytes / 1e6,
+            out_bytes / 1e6,
+            (in_bytes - out_bytes) / 1e6,
+        )
+    return out_df